@@ -1,16 +1,81 @@
 from collections import Counter
 
+import numpy as np
+
+MOD = 10**9 + 7
+PRIMES = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29]
+MAX_VALUE = 30
+# The number of lists of nums counted at once by count_good_subsets:
+# the dp table of a batch, 1024 states by BATCH_ROWS, stays in cache.
+BATCH_ROWS = 64
+
+
+def value_masks():
+    """The bitmasks of the primes of the square-free numbers up to 30."""
+    masks = {p: pow(2, i) for i, p in enumerate(PRIMES)}
+    for p in PRIMES:
+        for q in PRIMES:
+            if p > q and p*q < 30:
+                masks[p*q] = masks[p]+masks[q]
+    masks[30] = 7
+    return masks
+
+
+MASKS = value_masks()
+STATES = np.arange(pow(2, len(PRIMES)))
+# For each square-free number, the states (bitmasks of primes) disjoint
+# from its mask, and those states with its mask added.
+UPDATES = {}
+for n, mask_n in MASKS.items():
+    free = np.flatnonzero((STATES & mask_n) == 0)
+    UPDATES[n] = free, free | mask_n
+
+
+def counts_matrix(nums_lists):
+    """The counts of the numbers from 0 to 30 in each list of nums,
+    as the rows of a matrix."""
+    counts = np.zeros((len(nums_lists), MAX_VALUE + 1), dtype=np.int64)
+    for row, nums in zip(counts, nums_lists):
+        row_counts = np.bincount(nums, minlength=MAX_VALUE + 1)
+        if len(row_counts) > MAX_VALUE + 1:
+            raise ValueError(f'numbers above {MAX_VALUE}')
+        row += row_counts
+    return counts
+
+
+def count_good_subsets(counts):
+    """The number of good subsets of each list of nums, given as a matrix
+    with counts[i, n] the number of copies of n in the i-th list."""
+    counts = np.asarray(counts, dtype=np.int64)
+    results = np.empty(len(counts), dtype=np.int64)
+    for begin in range(0, len(counts), BATCH_ROWS):
+        batch = counts[begin:begin + BATCH_ROWS].T % MOD
+        # The lists of the batch are the columns of the dp table,
+        # so that each state is a contiguous row.
+        dp = np.zeros((len(STATES), batch.shape[1]), dtype=np.int64)
+        dp[0] = 1
+        for n, (free, targets) in UPDATES.items():
+            if batch[n].any():
+                # The mask of n is not 0, so the free states and the targets
+                # are disjoint, and dp can be updated in place.
+                dp[targets] = (dp[targets] + batch[n] * dp[free]) % MOD
+        powers = np.array([pow(2, int(ones), MOD)
+                           for ones in counts[begin:begin + BATCH_ROWS, 1]],
+                          dtype=np.int64)
+        results[begin:begin + BATCH_ROWS] = ((dp.sum(axis=0) - 1) % MOD
+                                             * powers) % MOD
+    return results
+
+
 class Solution:
     def numberOfGoodSubsets(self, nums):
-        mod = (10**9+7)
-        primes = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29]
-        masks = {p: pow(2,i) for i, p in enumerate(primes)}
-
-        for p in primes:
-            for q in primes:
-                if p > q and p*q < 30:
-                    masks[p*q] = masks[p]+masks[q]
-        masks[30] = 7
+        return int(count_good_subsets(counts_matrix([nums]))[0])
+
+    def numberOfGoodSubsetsLoop(self, nums):
+        """The dp table updated one state at a time, in pure Python."""
+        mod = MOD
+        primes = PRIMES
+        masks = MASKS
 
         counts = Counter(nums)
         dp = [1] + [0] * (pow(2, len(primes))-1)
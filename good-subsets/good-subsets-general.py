@@ -0,0 +1,132 @@
+""" The number of good subsets, for numbers up to about 1000.
+
+Any number up to max_value has at most one prime factor larger than
+sqrt(max_value). So only the primes up to sqrt(max_value) (the small primes)
+need to be kept track of in a bitmask, and the numbers with a large prime
+factor are grouped by it: a good subset uses at most one number of a group.
+
+For more details, see the README in the file's github folder.
+"""
+from collections import defaultdict
+
+import numpy as np
+
+MOD = 10**9 + 7
+
+
+def smallest_prime_factors(limit):
+    """The smallest prime factor of each number up to limit (0 for 0 and 1)."""
+    factors = list(range(limit + 1))
+    factors[:2] = [0] * min(2, limit + 1)
+    for p in range(2, int(limit**0.5) + 1):
+        if factors[p] == p:
+            for multiple in range(p * p, limit + 1, p):
+                if factors[multiple] == multiple:
+                    factors[multiple] = p
+    return factors
+
+
+def square_free_factors(max_value):
+    """The prime factors of the square-free numbers from 2 to max_value."""
+    smallest = smallest_prime_factors(max_value)
+    factors = {}
+    for n in range(2, max_value + 1):
+        primes, rest = [], n
+        while rest > 1:
+            p = smallest[rest]
+            rest //= p
+            if rest % p == 0:
+                break
+            primes.append(p)
+        else:
+            factors[n] = primes
+    return factors
+
+
+class GoodSubsetCounter:
+    """Counts the good subsets of lists of numbers from 1 to max_value.
+
+    The table of the numbers to use is built once: the bitmask of the
+    small primes of each square-free number, the indexes of the states
+    (bitmasks) disjoint from it, and the groups of numbers sharing a
+    large prime. Each update of the dp table is then a few array operations.
+    The table has 2^(number of small primes) states, which is 2048 for
+    max_value up to 1368, and doubles with every prime squared above that.
+    """
+    def __init__(self, max_value=30):
+        self.max_value = max_value
+        factors = square_free_factors(max_value)
+        self.small_primes = [p for p in sorted({p for primes in factors.values()
+                                                for p in primes})
+                             if p * p <= max_value]
+        bits = {p: 1 << i for i, p in enumerate(self.small_primes)}
+        self.states = np.arange(1 << len(self.small_primes))
+
+        self._free = {}
+        # Numbers without a large prime factor, and groups of the numbers
+        # with the same large prime factor, as lists of (n, mask).
+        self.singles = []
+        groups = defaultdict(list)
+        for n, primes in factors.items():
+            mask = sum(bits.get(p, 0) for p in primes)
+            self._free_states(mask)
+            large = [p for p in primes if p not in bits]
+            if large:
+                groups[large[0]].append((n, mask))
+            else:
+                self.singles.append((n, mask))
+        self.groups = list(groups.values())
+
+    def _free_states(self, mask):
+        """The states disjoint from mask, and those states with mask added."""
+        if mask not in self._free:
+            free = np.flatnonzero((self.states & mask) == 0)
+            self._free[mask] = free, free | mask
+        return self._free[mask]
+
+    def count(self, nums):
+        counts = np.bincount(np.asarray(nums), minlength=self.max_value + 1)
+        if len(counts) > self.max_value + 1:
+            raise ValueError(f'numbers above {self.max_value}')
+        return self.count_from_counts(counts)
+
+    def count_from_counts(self, counts):
+        """The number of good subsets of a list with counts[n] copies of n."""
+        ones = int(counts[1]) if len(counts) > 1 else 0
+        counts = np.asarray(counts, dtype=np.int64) % MOD
+        dp = np.zeros(len(self.states), dtype=np.int64)
+        dp[0] = 1
+        for n, mask in self.singles:
+            if counts[n]:
+                # mask is not 0, so the free states and their targets
+                # are disjoint, and dp can be updated in place.
+                free, targets = self._free[mask]
+                dp[targets] = (dp[targets] + counts[n] * dp[free]) % MOD
+        for group in self.groups:
+            new_dp = dp.copy()
+            for n, mask in group:
+                if counts[n]:
+                    free, targets = self._free[mask]
+                    new_dp[targets] = (new_dp[targets]
+                                       + counts[n] * dp[free]) % MOD
+            dp = new_dp
+        return (int(dp.sum()) - 1) * pow(2, ones, MOD) % MOD
+
+
+class Solution:
+    def numberOfGoodSubsets(self, nums):
+        return GoodSubsetCounter(max(nums)).count(nums)
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    s = Solution()
+    print(s.numberOfGoodSubsets([1, 2, 3, 4]))
+    print(s.numberOfGoodSubsets([4, 2, 3, 15]))
+
+    random.seed(0)
+    ns = [random.randint(1, 1000) for _ in range(10**5)]
+    start = time.perf_counter()
+    print(s.numberOfGoodSubsets(ns), f'{time.perf_counter() - start:.3f}s')
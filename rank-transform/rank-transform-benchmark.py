@@ -0,0 +1,122 @@
+""" Benchmarks of the component-finding strategies of rank-transform.py.
+
+The code below generates matrices of several families
+(random values, few distinct values, all values equal,
+a permutation of 0, ..., n*n-1, and banded matrices)
+of several sizes, and for each of the versions of rank-transform.py
+measures the throughput (cells per second) and the peak memory
+(as traced by tracemalloc) of computing the rank transform.
+It also reports the version that the 'AUTO' setting picks.
+
+    python rank-transform-benchmark.py [size ...]
+
+For more details, see the README in the file's github folder.
+"""
+import importlib.util
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+
+def load_script(file_name, module_name):
+    """Import a script of this folder as a module."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), file_name)
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+rank_transform = load_script('rank-transform.py', 'rank_transform')
+
+SIZES = [2, 3, 4, 5, 7, 10, 15, 20, 30, 50, 200, 500]
+VERSIONS = ['BFS', 'UF_SIZE', 'UF_RANK', 'UF_ARRAY', 'NUMPY']
+REPEATS = 3
+# Small matrices are ranked repeatedly within each timed run,
+# so that a run covers about this many cells.
+CELLS_PER_RUN = 10**4
+
+
+def random_matrix(n, rng):
+    return [[rng.randint(-10**9, 10**9) for _ in range(n)] for _ in range(n)]
+
+
+def few_values_matrix(n, rng):
+    return [[rng.randint(0, 9) for _ in range(n)] for _ in range(n)]
+
+
+def all_equal_matrix(n, rng):
+    return [[7] * n for _ in range(n)]
+
+
+def permutation_matrix(n, rng):
+    values = rng.sample(range(n * n), n * n)
+    return [values[i * n:(i + 1) * n] for i in range(n)]
+
+
+def banded_matrix(n, rng):
+    """Random values within distance n // 10 of the diagonal, zeros elsewhere."""
+    band = max(1, n // 10)
+    return [[rng.randint(1, 10**9) if abs(i - j) <= band else 0
+             for j in range(n)] for i in range(n)]
+
+
+FAMILIES = {'random': random_matrix,
+            'few-values': few_values_matrix,
+            'all-equal': all_equal_matrix,
+            'permutation': permutation_matrix,
+            'banded': banded_matrix}
+
+
+def run(version, matrix):
+    rank_transform._VERSION = version
+    return rank_transform.Solution().matrixRankTransform(matrix)
+
+
+def measure(version, matrix, repeats=REPEATS):
+    """Return the throughput, in cells per second (for the best of repeats
+    runs), and the peak traced memory, in bytes, of the version on matrix."""
+    cells = len(matrix) * len(matrix[0])
+    number = max(1, CELLS_PER_RUN // cells)
+    seconds = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            run(version, matrix)
+        seconds = min(seconds, (time.perf_counter() - start) / number)
+    # Tracing slows things down, so it gets a run of its own.
+    tracemalloc.start()
+    run(version, matrix)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cells / seconds, peak
+
+
+def benchmark(sizes=SIZES, seed=0):
+    rng = random.Random(seed)
+    print(f'{"family":12}{"size":>6}' + ''.join(f'{version:>18}'
+                                               for version in VERSIONS)
+          + f'{"best":>10}{"auto":>10}')
+    for size in sizes:
+        for family, generate in FAMILIES.items():
+            matrix = generate(size, rng)
+            results = {version: measure(version, matrix)
+                       for version in VERSIONS}
+            best = max(VERSIONS, key=lambda version: results[version][0])
+            line = f'{family:12}{size:6}'
+            for version in VERSIONS:
+                throughput, peak = results[version]
+                line += f'{throughput / 1000:9.0f}k/s{peak / 2**20:5.0f}MB'
+            line += f'{best:>10}{rank_transform.choose_version(matrix):>10}'
+            print(line, flush=True)
+
+
+def main():
+    benchmark([int(size) for size in sys.argv[1:]] or SIZES)
+
+
+if __name__ == '__main__':
+    main()
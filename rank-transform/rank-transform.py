@@ -25,27 +25,68 @@ of our graph need to be assigned their rank simultaneously.
 
 Please see the README on this files github for further details.
 """
-import copy
+import heapq
+import os
+import random
+import tempfile
+from bisect import bisect_left, insort
 from abc import ABC
 from abc import abstractmethod
+from collections import Counter
 from collections import defaultdict
 from collections import deque
-from typing import List, Iterable, DefaultDict, Hashable, Set
-
-# Choose 'BFS', 'UF_SIZE', 'UF_RANK'
-_VERSION = 'BFS'
+from multiprocessing import Pool
+from typing import List, Iterable
+
+# NumPy is only needed by the NumPy versions, and imported on their first use
+# by _import_numpy(), so the list-based versions also work without it.
+np = None
+
+# Choose 'BFS', 'UF_SIZE', 'UF_RANK', 'UF_ARRAY', 'NUMPY', 'PARALLEL',
+# or 'AUTO' to let choose_version pick one for each matrix.
+_VERSION = 'AUTO'
+
+
+def choose_version(matrix):
+    """The fastest version for matrix, according to the measurements of
+    rank-transform-benchmark.py. NumpyRanker wins on all matrices
+    of at least 2500 cells, on those where many values occur only once,
+    and on those with a value occurring more than 100 times (whose cells
+    it ranks with array operations). On the remaining small matrices,
+    made of small groups of equal values, and on matrices of at most
+    4 cells, its overhead dominates and BFS wins.
+    Without NumPy installed, it is always BFS."""
+    cells = len(matrix) * len(matrix[0])
+    if cells <= 4:
+        return 'BFS'
+    if cells < 2500:
+        counts = Counter(x for row in matrix for x in row)
+        singletons = sum(count == 1 for count in counts.values())
+        if max(counts.values()) <= 100 and 4 * singletons < cells:
+            return 'BFS'
+    return 'NUMPY' if _import_numpy() else 'BFS'
 
 
 class Solution:
     def matrixRankTransform(self, matrix: List[List[int]]) -> List[List[int]]:
+        version = choose_version(matrix) if _VERSION == 'AUTO' else _VERSION
+        if version == 'NUMPY':
+            return NumpyRanker(matrix).solution.tolist()
+        if version == 'PARALLEL':
+            return ParallelRanker(matrix).solution.tolist()
+        index_count = len(matrix) + len(matrix[0])
         version_parameters = {
-            'BFS': (EdgesToComponentsBFS,),
+            'BFS': (EdgesToComponentsBFS,
+                    {'workspace': BFSWorkspace(index_count)}),
             'UF_SIZE': (EdgesToComponentsUF,
                         {'strategy_class': ComponentCollectionSizeBased}),
             'UF_RANK': (EdgesToComponentsUF,
                         {'strategy_class': ComponentCollectionRankBased}),
+            'UF_ARRAY': (EdgesToComponentsArrayUF,
+                         {'collection': ComponentCollectionArrayBased(
+                             index_count)}),
             }
-        ranker = Ranker(matrix, *version_parameters[_VERSION])
+        ranker = Ranker(matrix, *version_parameters[version])
         return ranker.solution
 
 
@@ -109,6 +150,481 @@ class Ranker:
             self._solution[i][j] = self._index_ranks[i]
 
 
+def _import_numpy():
+    """Import NumPy as np, unless it is imported already.
+    Return whether it is installed."""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+        np = numpy
+    return True
+
+
+class NumpyRanker:
+    """A Ranker for large matrices, given as NumPy arrays (or anything
+    np.asarray accepts).
+
+    A single argsort of the flattened matrix groups the cells
+    by value, and gives the row and (shifted) column index arrays
+    of every value group as slices.
+    Small groups are handled in plain Python, with the same
+    array-based union-find for every value;
+    large ones find their components and ranks with array operations.
+    The ranks, computed in sorted order, are scattered back into
+    the result with one fancy-indexing assignment.
+    """
+    # Groups with at least this many cells are handled with NumPy.
+    LARGE_GROUP = 64
+
+    def __init__(self, matrix, index_ranks=None):
+        if not _import_numpy():
+            raise ImportError('the NumPy versions need NumPy')
+        self._matrix = np.asarray(matrix)
+        self._depth, self._width = self._matrix.shape
+        if index_ranks is None:
+            index_ranks = [0] * (self._depth + self._width)
+        self._index_ranks = index_ranks
+        self._collection = ComponentCollectionArrayBased(
+            self._depth + self._width)
+        self._solution = None
+
+    @property
+    def solution(self):
+        if self._solution is None:
+            self._solution = self._compute_solution()
+        return self._solution
+
+    def _compute_solution(self):
+        values = self._matrix.ravel()
+        order, groups = self._groups(values)
+        solution = np.empty(len(values), dtype=np.int64)
+        solution[order] = self._rank_sorted_cells(order, groups)
+        return solution.reshape(self._depth, self._width)
+
+    @staticmethod
+    def _groups(values):
+        """The order that sorts values, and the start and end
+        (in that order) of each group of equal values."""
+        # The order of cells within a group does not matter,
+        # so the sort need not be stable.
+        order = np.argsort(values)
+        sorted_values = values[order]
+        starts = np.flatnonzero(sorted_values[1:] != sorted_values[:-1]) + 1
+        bounds = np.concatenate(([0], starts, [len(values)])).tolist()
+        return order, zip(bounds[:-1], bounds[1:])
+
+    def _rank_sorted_cells(self, cells, groups):
+        """Rank the cells, given by their indexes in the flattened matrix
+        and sorted by value, with groups the bounds of equal values.
+        The cells of all lower values must have been ranked already."""
+        rows = cells // self._width
+        columns = cells % self._width + self._depth
+        row_list, column_list = rows.tolist(), columns.tolist()
+        index_ranks = self._index_ranks
+        collection = self._collection
+        ranks = [0] * len(cells)
+        large_groups = []
+        for start, end in groups:
+            if end - start == 1:
+                i, j = row_list[start], column_list[start]
+                r = max(index_ranks[i], index_ranks[j]) + 1
+                index_ranks[i] = index_ranks[j] = r
+                ranks[start] = r
+            elif end - start < self.LARGE_GROUP:
+                collection.reset()
+                for k in range(start, end):
+                    collection.union(row_list[k], column_list[k])
+                for component in collection.component_list():
+                    r = max(index_ranks[index] for index in component) + 1
+                    for index in component:
+                        index_ranks[index] = r
+                for k in range(start, end):
+                    ranks[k] = index_ranks[row_list[k]]
+            else:
+                large_groups.append((start, end, self._rank_large_group(
+                    rows[start:end], columns[start:end])))
+        sorted_ranks = np.array(ranks, dtype=np.int64)
+        for start, end, group_ranks in large_groups:
+            sorted_ranks[start:end] = group_ranks
+        return sorted_ranks
+
+    def _rank_large_group(self, rows, columns):
+        """Rank the cells of one value group, updating the index ranks."""
+        index_ranks = self._index_ranks
+        # Renumber the indexes of the group 0, 1, ... .
+        present = np.zeros(len(index_ranks), dtype=bool)
+        present[rows] = True
+        present[columns] = True
+        vertices = np.flatnonzero(present)
+        renumber = np.cumsum(present) - 1
+        row_ends, column_ends = renumber[rows], renumber[columns]
+        labels = NumpyRanker._component_labels(row_ends, column_ends,
+                                               len(vertices))
+        vertex_list = vertices.tolist()
+        current = np.array([index_ranks[v] for v in vertex_list])
+        component_ranks = np.zeros(len(vertices), dtype=np.int64)
+        np.maximum.at(component_ranks, labels, current)
+        new_ranks = component_ranks[labels] + 1
+        for v, r in zip(vertex_list, new_ranks.tolist()):
+            index_ranks[v] = r
+        return new_ranks[row_ends]
+
+    @staticmethod
+    def _component_labels(u, v, count):
+        """Label each of the vertices 0, ..., count-1 of the graph
+        with edges (u[k], v[k]) by the smallest vertex of its component.
+
+        Every vertex points to a smaller (or the same) vertex,
+        and the pointers of all vertices are followed to the roots
+        until they stop changing (shortcutting). Then, for every edge
+        joining two different trees, the root with the larger label
+        is hooked under the smaller one. Repeat until no edge joins
+        different trees."""
+        labels = np.arange(count)
+        while True:
+            ends_u, ends_v = labels[u], labels[v]
+            differ = ends_u != ends_v
+            if not differ.any():
+                return labels
+            low = np.minimum(ends_u[differ], ends_v[differ])
+            high = np.maximum(ends_u[differ], ends_v[differ])
+            np.minimum.at(labels, high, low)
+            while True:
+                jumped = labels[labels]
+                if np.array_equal(jumped, labels):
+                    break
+                labels = jumped
+
+
+class ParallelRanker(NumpyRanker):
+    """A NumpyRanker that ranks independent blocks of the matrix
+    in a pool of processes.
+
+    Once all cells with values up to some t are ranked, the remaining
+    cells split into blocks: connected components of the graph
+    of row and column indexes, with the remaining cells as edges.
+    The ranks in a block depend only on the ranks already assigned
+    in its rows and columns, so blocks can be ranked independently.
+    We take t to be the most common value, so that for block-structured
+    or sparse matrices the background (and anything below it)
+    is ranked first, and the blocks are what is left.
+    """
+    # Fewer cells than this, in all blocks together, are ranked in place.
+    MIN_PARALLEL_CELLS = 1 << 16
+
+    def __init__(self, matrix, processes=None):
+        super().__init__(matrix)
+        self._processes = processes
+
+    def _compute_solution(self):
+        values = self._matrix.ravel()
+        solution = np.empty(len(values), dtype=np.int64)
+        distinct, counts = np.unique(values, return_counts=True)
+        background = distinct[np.argmax(counts)]
+
+        # Rank the background and below in place.
+        cells = np.flatnonzero(values <= background)
+        order, groups = self._groups(values[cells])
+        cells = cells[order]
+        solution[cells] = self._rank_sorted_cells(cells, groups)
+
+        blocks = self._blocks(np.flatnonzero(values > background))
+        tasks = [self._block_task(block, values[block]) for block in blocks]
+        parallel = sum(map(len, blocks)) >= self.MIN_PARALLEL_CELLS
+        if len(blocks) > 1 and parallel:
+            # Biggest blocks first, for a better balance between processes.
+            by_size = sorted(range(len(blocks)), key=lambda b: -len(blocks[b]))
+            with Pool(self._processes) as pool:
+                results = pool.map(_rank_block, [tasks[b] for b in by_size])
+            for b, ranks in zip(by_size, results):
+                solution[blocks[b]] = ranks
+        else:
+            for block, task in zip(blocks, tasks):
+                solution[block] = _rank_block(task)
+        return solution.reshape(self._depth, self._width)
+
+    def _blocks(self, cells):
+        """Split cells into the blocks of connected rows and columns."""
+        if not len(cells):
+            return []
+        rows = cells // self._width
+        columns = cells % self._width + self._depth
+        labels = self._component_labels(rows, columns,
+                                        self._depth + self._width)[rows]
+        order = np.argsort(labels, kind='stable')
+        starts = np.flatnonzero(np.diff(labels[order])) + 1
+        return np.split(cells[order], starts)
+
+    def _block_task(self, block, values):
+        """The block as a matrix of its own rows and columns,
+        given by its cells (flattened indexes) and their values,
+        with the ranks of its rows and columns so far."""
+        rows = block // self._width
+        columns = block % self._width
+        block_rows, local_rows = np.unique(rows, return_inverse=True)
+        block_columns, local_columns = np.unique(columns, return_inverse=True)
+        index_ranks = ([self._index_ranks[i] for i in block_rows.tolist()]
+                       + [self._index_ranks[j + self._depth]
+                          for j in block_columns.tolist()])
+        shape = (len(block_rows), len(block_columns))
+        return (shape, local_rows * shape[1] + local_columns, values,
+                index_ranks)
+
+
+def _rank_block(task):
+    """The ranks of the cells of a block of a ParallelRanker."""
+    _import_numpy()  # Not done yet in a newly started worker process.
+    shape, cells, values, index_ranks = task
+    # The ranker only needs the shape of the block, not its values.
+    ranker = NumpyRanker(np.broadcast_to(0, shape), index_ranks)
+    order, groups = ranker._groups(values)
+    ranks = np.empty(len(cells), dtype=np.int64)
+    ranks[order] = ranker._rank_sorted_cells(cells[order], groups)
+    return ranks
+
+
+class StreamingRanker(NumpyRanker):
+    """A NumpyRanker for matrices that do not fit in memory.
+
+    The matrix is read (typically from an np.memmap) in blocks of rows,
+    and each cell is appended, as a (cell index, value) record,
+    to one of several temporary bucket files, by the range of its value.
+    The ranges are chosen from a sample of the values, so that each bucket
+    holds about chunk_cells cells. The buckets are then loaded one by one
+    in increasing order of values, sorted and ranked like in NumpyRanker,
+    and the ranks are written into output (typically an np.memmap, too).
+    Thus only the index ranks and one bucket are kept in memory.
+    A bucket can hold more than chunk_cells cells only if a single value
+    appears more often than that.
+    """
+    CHUNK_CELLS = 1 << 24
+    SAMPLE_SIZE = 1 << 16
+
+    def __init__(self, matrix, output, chunk_cells=CHUNK_CELLS, temp_dir=None):
+        super().__init__(matrix)
+        self._output = output
+        self._chunk_cells = chunk_cells
+        self._temp_dir = temp_dir
+
+    def _row_blocks(self):
+        block = max(1, self._chunk_cells // self._width)
+        for start in range(0, self._depth, block):
+            yield start, np.asarray(self._matrix[start:start + block])
+
+    def _bucket_bounds(self):
+        """Values splitting the matrix into buckets of about chunk_cells."""
+        buckets = -(-self._depth * self._width // self._chunk_cells)
+        if buckets <= 1:
+            return np.array([], dtype=self._matrix.dtype)
+        step = max(1, self._depth * self._width // self.SAMPLE_SIZE)
+        sample = self._matrix.reshape(-1)[::step]
+        quantiles = np.quantile(sample, np.arange(1, buckets) / buckets,
+                                method='lower')
+        return np.unique(quantiles)
+
+    def _compute_solution(self):
+        bounds = self._bucket_bounds()
+        record = np.dtype([('cell', np.int64), ('value', self._matrix.dtype)])
+        with tempfile.TemporaryDirectory(dir=self._temp_dir) as folder:
+            names = [os.path.join(folder, f'bucket-{b}')
+                     for b in range(len(bounds) + 1)]
+            files = [open(name, 'wb') for name in names]
+            try:
+                for start, rows in self._row_blocks():
+                    records = np.empty(rows.size, dtype=record)
+                    records['cell'] = np.arange(start * self._width,
+                                                start * self._width
+                                                + rows.size)
+                    records['value'] = rows.ravel()
+                    buckets = np.searchsorted(bounds, records['value'],
+                                              side='right')
+                    # Group the records by bucket, keeping the block order.
+                    order = np.argsort(buckets, kind='stable')
+                    ends = np.searchsorted(buckets[order],
+                                           np.arange(len(files) + 1))
+                    for b, file_out in enumerate(files):
+                        records[order[ends[b]:ends[b + 1]]].tofile(file_out)
+            finally:
+                for file_out in files:
+                    file_out.close()
+
+            output = self._output.reshape(-1)
+            for name in names:
+                records = np.fromfile(name, dtype=record)
+                os.remove(name)
+                order, groups = self._groups(records['value'])
+                cells = records['cell'][order]
+                del records
+                output[cells] = self._rank_sorted_cells(cells, groups)
+        return self._output
+
+
+def rank_transform_file(input_name, output_name, shape, dtype='int64',
+                        chunk_cells=StreamingRanker.CHUNK_CELLS):
+    """Rank transform the matrix stored in the binary file input_name,
+    as C-ordered values of type dtype, into the file output_name,
+    as C-ordered int64 ranks."""
+    if not _import_numpy():
+        raise ImportError('the NumPy versions need NumPy')
+    matrix = np.memmap(input_name, dtype=dtype, mode='r', shape=shape)
+    output = np.memmap(output_name, dtype=np.int64, mode='w+', shape=shape)
+    StreamingRanker(matrix, output, chunk_cells).solution
+    output.flush()
+
+
+class IncrementalRanker:
+    """Maintains the rank transform of a matrix under changes of cells.
+
+    For every row and column (index) we keep the sorted list
+    of (value, other index) of its cells. Since ranks increase with values
+    along an index, the maximal rank among the cells of an index
+    with values below v is the rank of the last such cell,
+    found by bisection.
+
+    When cells change, only the indexes of the changed cells
+    are initially dirty. Going through values in increasing order
+    (with a heap), for every dirty index having cells with the current value
+    we find its component (among the cells of that value) by BFS,
+    and recompute its rank. If the rank of the component changed,
+    all of its indexes become dirty. An index stays dirty until
+    its ranks stop changing at a value above all changes of its own cells:
+    at the first value above them, the cell just below may be a different
+    cell than before, even if the rank of the moved cell did not change.
+    """
+    def __init__(self, matrix):
+        self._matrix = [row[:] for row in matrix]
+        self._depth = len(self._matrix)
+        self._width = len(self._matrix[0])
+        self._ranks = Solution().matrixRankTransform(self._matrix)
+        self._lines = [[] for _ in range(self._depth + self._width)]
+        for i in range(self._depth):
+            for j in range(self._width):
+                self._lines[i].append((self._matrix[i][j], j + self._depth))
+                self._lines[j + self._depth].append((self._matrix[i][j], i))
+        for line in self._lines:
+            line.sort()
+
+    @property
+    def solution(self):
+        return self._ranks
+
+    def set_cell(self, i, j, value):
+        self.update([(i, j, value)])
+
+    def update(self, changes):
+        """Set matrix[i][j] = value for every (i, j, value) in changes
+        and update the ranks."""
+        # index -> the largest value at which its cells changed
+        pending = {}
+        # value -> indexes to process at that value
+        scheduled = defaultdict(set)
+        heap = []
+        for i, j, value in changes:
+            old = self._matrix[i][j]
+            if old == value:
+                continue
+            self._matrix[i][j] = value
+            for k, other in ((i, j + self._depth), (j + self._depth, i)):
+                line = self._lines[k]
+                line.pop(bisect_left(line, (old, other)))
+                insort(line, (value, other))
+                pending[k] = max(pending.get(k, value), old, value)
+                self._schedule(k, min(old, value), scheduled, heap)
+
+        while heap:
+            value = heapq.heappop(heap)
+            starts = scheduled.pop(value)
+            visited = set()
+            for start in starts:
+                if start in visited:
+                    continue
+                indexes, cells = self._component(start, value, visited)
+                rank = max(self._rank_below(k, value) for k in indexes) + 1
+                changed = False
+                for i, j in cells:
+                    if self._ranks[i][j] != rank:
+                        self._ranks[i][j] = rank
+                        changed = True
+                for k in indexes:
+                    # Past the largest changed value of k, the cell before
+                    # the next one may still be a different cell than before.
+                    if changed or k in pending and pending[k] >= value:
+                        self._schedule(k, value, scheduled, heap,
+                                       inclusive=False)
+
+    def _schedule(self, k, value, scheduled, heap, inclusive=True):
+        """Schedule index k at the first of its values
+        at least (or, if not inclusive, above) value."""
+        line = self._lines[k]
+        position = bisect_left(line, (value,) if inclusive
+                               else (value, float('inf')))
+        if position < len(line):
+            next_value = line[position][0]
+            if next_value not in scheduled:
+                heapq.heappush(heap, next_value)
+            scheduled[next_value].add(k)
+
+    def _cell(self, k, other):
+        if k < self._depth:
+            return k, other - self._depth
+        return other, k - self._depth
+
+    def _rank_below(self, k, value):
+        """The maximal rank of the cells of index k with smaller values."""
+        line = self._lines[k]
+        position = bisect_left(line, (value,))
+        if position == 0:
+            return 0
+        i, j = self._cell(k, line[position - 1][1])
+        return self._ranks[i][j]
+
+    def _component(self, start, value, visited):
+        """The indexes and cells of the component of start
+        in the graph of the cells with the given value."""
+        visited.add(start)
+        q = deque([start])
+        indexes, cells = [], []
+        while q:
+            k = q.popleft()
+            indexes.append(k)
+            line = self._lines[k]
+            position = bisect_left(line, (value,))
+            while position < len(line) and line[position][0] == value:
+                other = line[position][1]
+                if other not in visited:
+                    visited.add(other)
+                    q.append(other)
+                # every cell is listed once, from its row
+                if k < self._depth:
+                    cells.append((k, other - self._depth))
+                position += 1
+        return indexes, cells
+
+
+def check_incremental_ranker(trials=400, steps=10, seed=0):
+    """Compare IncrementalRanker with recomputing all ranks
+    after random batches of changes to random small matrices."""
+    rng = random.Random(seed)
+    for trial in range(trials):
+        depth, width = rng.randint(1, 8), rng.randint(1, 8)
+        spread = rng.randint(0, 6)
+        matrix = [[rng.randint(-spread, spread) for _ in range(width)]
+                  for _ in range(depth)]
+        ranker = IncrementalRanker(matrix)
+        for step in range(steps):
+            changes = [(rng.randrange(depth), rng.randrange(width),
+                        rng.randint(-spread - 1, spread + 1))
+                       for _ in range(rng.randint(1, 3))]
+            ranker.update(changes)
+            for i, j, value in changes:
+                matrix[i][j] = value
+            expected = Solution().matrixRankTransform(matrix)
+            assert ranker.solution == expected, (trial, step, matrix, changes)
+
+
 class EdgesToComponentsBase(ABC):
     def __init__(self, edges):
         self._edges = edges
@@ -126,38 +642,85 @@ class EdgesToComponentsBase(ABC):
         return vertices
 
 
+class BFSWorkspace:
+    """The arrays used by EdgesToComponentsBFS,
+    allocated once and reused for the graphs of all values.
+
+    The neighbours of a vertex v are kept as a linked list of edge ends:
+    head[v] is the first one, and for an edge end e, target[e] is
+    the neighbour and next[e] the following edge end (or -1).
+    head[v] is valid, and v is visited, only if stamp[v], respectively
+    visited[v], equals the generation, so a new graph just increments it.
+    """
+    def __init__(self, size):
+        self.generation = 0
+        self.head = [-1] * size
+        self.stamp = [0] * size
+        self.visited = [0] * size
+        self.target = []
+        self.next = []
+
+
 class EdgesToComponentsBFS(EdgesToComponentsBase):
+    def __init__(self, edges, workspace=None):
+        # The vertices are found while building the graph,
+        # so we skip building the vertex set.
+        self._edges = edges
+        if workspace is None:
+            workspace = BFSWorkspace(1 + max(max(edge) for edge in edges))
+        self._workspace = workspace
 
     def components(self) -> Iterable:
-        """A vanilla bfs component finder method."""
-
-        # Construct the dictionary of neighbours.
-        v_to_nbrs = self._vertex_to_neighbours()
-        # BFS
-        # Copy the vertices or use them up?
-        # We copy, even if using up is a bit faster.
-        remaining_vertices = copy.copy(self._vertices)
-        while remaining_vertices:
-            start = remaining_vertices.pop()
-            q = deque([start])
-            visited = {start}
-
-            while q:
-                v = q.popleft()
-                visited.add(v)
-                for w in v_to_nbrs[v]:
-                    if w not in visited:
-                        q.append(w)
-                        visited.add(w)
-                        remaining_vertices.remove(w)
-            yield visited
-
-    def _vertex_to_neighbours(self) -> DefaultDict[Hashable, Set]:
-        v_to_nbrs = defaultdict(set)
-        for i, j in self._edges:
-            v_to_nbrs[i].add(j)
-            v_to_nbrs[j].add(i)
-        return v_to_nbrs
+        """A vanilla bfs component finder method,
+        on the preallocated arrays of the workspace."""
+        edges = self._edges
+        # A single cell is a component on its own.
+        if len(edges) == 1:
+            yield list(edges[0])
+            return
+
+        ws = self._workspace
+        ws.generation += 1
+        generation = ws.generation
+        head, stamp, visited = ws.head, ws.stamp, ws.visited
+        target, next_end = ws.target, ws.next
+        if len(target) < 2 * len(edges):
+            target.extend([0] * (2 * len(edges) - len(target)))
+            next_end.extend([0] * (2 * len(edges) - len(next_end)))
+
+        # Construct the lists of neighbours.
+        vertices = []
+        end = 0
+        for i, j in edges:
+            if stamp[i] != generation:
+                stamp[i] = generation
+                head[i] = -1
+                vertices.append(i)
+            if stamp[j] != generation:
+                stamp[j] = generation
+                head[j] = -1
+                vertices.append(j)
+            target[end], next_end[end], head[i] = j, head[i], end
+            target[end + 1], next_end[end + 1], head[j] = i, head[j], end + 1
+            end += 2
+
+        # BFS, with the component itself as the queue
+        for start in vertices:
+            if visited[start] == generation:
+                continue
+            visited[start] = generation
+            component = [start]
+            position = 0
+            while position < len(component):
+                end = head[component[position]]
+                position += 1
+                while end != -1:
+                    w = target[end]
+                    if visited[w] != generation:
+                        visited[w] = generation
+                        component.append(w)
+                    end = next_end[end]
+            yield component
 
 
 class EdgesToComponentsUF(EdgesToComponentsBase):
@@ -176,6 +739,23 @@ class EdgesToComponentsUF(EdgesToComponentsBase):
         return graph.component_list()
 
 
+class EdgesToComponentsArrayUF(EdgesToComponentsBase):
+    def __init__(self, edges, collection):
+        # The collection finds its vertices as the edges are added,
+        # so we skip building the vertex set.
+        self._edges = edges
+        self._collection = collection
+
+    def components(self) -> Iterable:
+        """A union-find-based component finder method
+        that reuses one preallocated collection for all values."""
+        graph = self._collection
+        graph.reset()
+        for i, j in self._edges:
+            graph.union(i, j)
+        return graph.component_list()
+
+
 class ComponentCollection(ABC):
     """The union-find data structure.
 
@@ -255,6 +835,60 @@ class ComponentCollectionSizeBased(ComponentCollection):
             del self._parent_to_nodes[root1]
 
 
+class ComponentCollectionArrayBased(ComponentCollection):
+    """Union by rank over integer vertices 0, ..., size-1.
+
+    The parent and rank arrays are allocated once and reused for every value.
+    A vertex belongs to the current collection only if its stamp equals
+    the current generation, so reset just increments the generation,
+    and a vertex is initialized the first time an edge touches it.
+    """
+    def __init__(self, size):
+        self._parent = list(range(size))
+        self._rank = [0] * size
+        self._stamp = [0] * size
+        self._generation = 0
+        self._members = []
+
+    def reset(self):
+        self._generation += 1
+        self._members = []
+
+    def _touch(self, c):
+        if self._stamp[c] != self._generation:
+            self._stamp[c] = self._generation
+            self._parent[c] = c
+            self._rank[c] = 0
+            self._members.append(c)
+
+    def find_root(self, c):
+        # iterative, with path halving:
+        # every other node on the path is pointed to its grandparent
+        parent = self._parent
+        while parent[c] != c:
+            parent[c] = parent[parent[c]]
+            c = parent[c]
+        return c
+
+    def union(self, c1, c2):
+        self._touch(c1)
+        self._touch(c2)
+        root1, root2 = self.find_root(c1), self.find_root(c2)
+        if root1 != root2:
+            rank = self._rank
+            if rank[root1] > rank[root2]:
+                root1, root2 = root2, root1
+            self._parent[root1] = root2
+            if rank[root1] == rank[root2]:
+                rank[root2] += 1
+
+    def component_list(self):
+        components = defaultdict(list)
+        for node in self._members:
+            components[self.find_root(node)].append(node)
+        return components.values()
+
+
 def main():
     matrix = [
             [20,-21,14],
@@ -267,6 +901,7 @@ def main():
     ranks=sol.matrixRankTransform(matrix)
     for row in ranks:
         print(row)
+    check_incremental_ranker()
 
 
 if __name__ == '__main__':
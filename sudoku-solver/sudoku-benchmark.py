@@ -0,0 +1,161 @@
+""" Benchmarks of the Sudoku solvers on large boards.
+
+The code below generates sudoku instances of sizes 16, 25 and 36,
+saved in the test-instances/large folder, and times the engines of the
+backtracking solver of sudoku-solver.py and the local search solver
+of sudoku-local-search.py on them.
+
+    python sudoku-benchmark.py generate   (re)creates the instances,
+    python sudoku-benchmark.py            prints the timings.
+
+For more details, see the README in the file's github folder.
+"""
+import glob
+import importlib.util
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+INSTANCE_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               'test-instances', 'large')
+# Size of the board, fraction of cells given, number of instances,
+# and a tag for the file names.
+INSTANCE_FAMILIES = [(16, 0.45, 3, ''), (25, 0.55, 3, ''), (36, 0.6, 3, ''),
+                     (36, 0.2, 1, '-sparse')]
+TIME_LIMIT = 20
+FILE_EMPTY_SYMBOL = '0'
+
+
+def load_script(file_name, module_name):
+    """Import one of the solver scripts of this folder as a module."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), file_name)
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+backtracking = load_script('sudoku-solver.py', 'sudoku_solver')
+local_search = load_script('sudoku-local-search.py', 'sudoku_local_search')
+
+
+def generate_solution(shape, rng):
+    """A random solved board of the given shape.
+
+    Start from the solution where row x holds the values shifted by
+    vertical_size * (x % horizontal_size) + x // horizontal_size,
+    then shuffle the rows within each band, the bands, the columns
+    within each stack, the stacks and the symbols."""
+    h, v, size = shape.horizontal_size, shape.vertical_size, shape.size
+
+    def shuffled_lines(block, blocks):
+        order = rng.sample(range(blocks), blocks)
+        return [b * block + line for b in order
+                for line in rng.sample(range(block), block)]
+
+    rows = shuffled_lines(h, size // h)
+    columns = shuffled_lines(v, size // v)
+    symbols = rng.sample(shape.alphabet, size)
+    return [[symbols[(v * (x % h) + x // h + y) % size] for y in columns]
+            for x in rows]
+
+
+def generate_puzzle(shape, givens, rng):
+    """A random puzzle of the given shape with a fraction givens of its
+    cells filled in. It is solvable, but need not have a unique solution."""
+    board = generate_solution(shape, rng)
+    size = shape.size
+    cells = [(x, y) for x in range(size) for y in range(size)]
+    for x, y in rng.sample(cells, len(cells) - round(givens * len(cells))):
+        board[x][y] = backtracking.EMPTY_SYMBOL
+    return board
+
+
+def write_puzzle(board, file_out):
+    for row in board:
+        file_out.write("".join(
+            (FILE_EMPTY_SYMBOL if x == backtracking.EMPTY_SYMBOL else x) + " "
+            for x in row) + "\n")
+
+
+def generate(seed=0):
+    rng = random.Random(seed)
+    os.makedirs(INSTANCE_FOLDER, exist_ok=True)
+    for size, givens, count, tag in INSTANCE_FAMILIES:
+        shape = backtracking.Shape.for_size(size)
+        for number in range(1, count + 1):
+            file_name = os.path.join(INSTANCE_FOLDER,
+                                     f'n{size}{tag}-{number}.txt')
+            with open(file_name, 'w') as file_out:
+                write_puzzle(generate_puzzle(shape, givens, rng), file_out)
+
+
+def run_backtracking(board, engine):
+    return backtracking.ENGINES[engine](backtracking.Sudoku(board))
+
+
+def run_local_search(board, policy):
+    random.seed(0)
+    _, stats = local_search.Solution(local_search.POLICIES[policy]()).solve(
+        board)
+    return stats.solved
+
+
+# Name, runner, argument.
+ENTRANTS = [('mrv', run_backtracking, 'mrv'),
+            ('propagate', run_backtracking, 'propagate'),
+            ('dlx', run_backtracking, 'dlx'),
+            ('ls-annealing', run_local_search, 'annealing'),
+            ('ls-tabu', run_local_search, 'tabu')]
+
+
+def _timed(runner, argument, board, results):
+    start = time.perf_counter()
+    solved = runner(board, argument)
+    results.put((solved, time.perf_counter() - start))
+
+
+def time_entrant(runner, argument, board, time_limit):
+    """Solve board in a separate process, and return the time taken,
+    or None if it is not solved within time_limit seconds."""
+    results = multiprocessing.Queue()
+    worker = multiprocessing.Process(target=_timed,
+                                     args=(runner, argument, board, results))
+    worker.start()
+    worker.join(time_limit)
+    if worker.is_alive():
+        worker.terminate()
+        worker.join()
+        return None
+    solved, seconds = results.get()
+    return seconds if solved else None
+
+
+def benchmark(time_limit=TIME_LIMIT):
+    print(f'{"instance":18}'
+          + ''.join(f'{name:>14}' for name, _, _ in ENTRANTS))
+    for file_name in sorted(glob.glob(os.path.join(INSTANCE_FOLDER, '*.txt'))):
+        with open(file_name) as file_in:
+            board = backtracking.board_from_file(file_in, FILE_EMPTY_SYMBOL)
+        line = f'{os.path.basename(file_name):18}'
+        for _, runner, argument in ENTRANTS:
+            seconds = time_entrant(runner, argument, board, time_limit)
+            if seconds is not None:
+                line += f'{seconds:13.3f}s'
+            else:
+                line += f'{">" + str(time_limit) + "s":>14}'
+        print(line, flush=True)
+
+
+def main():
+    if sys.argv[1:] == ['generate']:
+        generate()
+    else:
+        benchmark()
+
+
+if __name__ == '__main__':
+    main()
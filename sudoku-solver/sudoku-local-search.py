@@ -12,19 +12,37 @@ For more details, see the README in the file's github folder.
 """
 
 from typing import List
+import dataclasses
+import glob
+import math
+import os
 import random
-from itertools import product
+import sys
+import time
 
 MAX_ATTEMPTS = 1000
 RESTART_RATIO = 3
+RATE_SAMPLE_STEPS = 10000
+# The shape of boards of size N, unless given otherwise.
 N_h = 3
 N_v = 3
 N = N_h * N_v
 ALPHABET = [str(n) for n in range(1, N+1)]
-alphabet_dict = {ALPHABET[i]: i for i in range(N)}
 BYE_SYMBOL = '.'
 
 
+def board_shape(size):
+    """Return N_h, N_v and the alphabet for boards of the given size.
+
+    Boxes are N_v rows tall and N_h columns wide. For sizes other than N
+    they are as close to square as possible (e.g. 2 x 3 for size 6),
+    and the alphabet is '1', '2', ..., str(size)."""
+    if size == N:
+        return N_h, N_v, ALPHABET
+    n_v = max(h for h in range(1, int(size ** 0.5) + 1) if size % h == 0)
+    return size // n_v, n_v, [str(n) for n in range(1, size+1)]
+
+
 class SetList(object): # a set with random choice
     def __init__(self):
         self.item_to_position = {}
@@ -43,6 +61,14 @@ class SetList(object): # a set with random choice
             self.items[position] = last_item
             self.item_to_position[last_item] = position
 
+    def discard(self, item):
+        if item in self.item_to_position:
+            self.remove(item)
+
+    def update(self, items):
+        for item in items:
+            self.add(item)
+
     def choose_random(self):
         return random.choice(self.items)
 
@@ -64,43 +90,207 @@ class SetList(object): # a set with random choice
         return repr(self.items)
 
 
+# Acceptance policies decide which swap to make once a conflicted cell
+# has been picked. They are given the options, as tuples
+#   (box-mate cell, its value, conflict, delta),
+# where conflict is the number of cells the two values would clash with
+# after the swap, and delta is the change in the total number of conflicts
+# (repeated values in rows and columns) that the swap would cause.
+# They return the option to take, or None to make no swap this step.
+class GreedyPolicy:
+    """Always swap with the box-mate giving the fewest clashes."""
+    def restart(self):
+        pass
+
+    def choose(self, step, cell, val, options, cost, best_cost):
+        best = options[0]
+        for option in options:
+            if option[2] < best[2]:
+                best = option
+        return best
+
+
+class AnnealingPolicy:
+    """Simulated annealing: swap with a random box-mate, accepting
+    a swap that increases the cost by delta with probability
+    exp(-delta/temperature). The temperature starts at
+    initial_temperature at each restart and is multiplied
+    by cooling_rate after each step, down to minimal_temperature."""
+    def __init__(self, initial_temperature=0.6, cooling_rate=0.9999,
+                 minimal_temperature=0.05):
+        self.initial_temperature = initial_temperature
+        self.cooling_rate = cooling_rate
+        self.minimal_temperature = minimal_temperature
+        self.temperature = initial_temperature
+
+    def restart(self):
+        self.temperature = self.initial_temperature
+
+    def choose(self, step, cell, val, options, cost, best_cost):
+        option = random.choice(options)
+        delta = option[3]
+        temperature = self.temperature
+        self.temperature = max(temperature * self.cooling_rate,
+                               self.minimal_temperature)
+        if delta <= 0 or random.random() < math.exp(-delta / temperature):
+            return option
+        return None
+
+
+class TabuPolicy:
+    """Tabu search: swap with the box-mate giving the lowest cost,
+    except that a value may not return to a cell it left in the last
+    tenure steps, unless this would give the lowest cost seen so far
+    in the attempt (the aspiration rule)."""
+    def __init__(self, tenure=2):
+        self.tenure = tenure
+        self.tabu_until = {}
+
+    def restart(self):
+        self.tabu_until = {}
+
+    def choose(self, step, cell, val, options, cost, best_cost):
+        best, ties = None, 0
+        for option in options:
+            alt_cell, alt_val, _, delta = option
+            tabu = (self.tabu_until.get((cell, alt_val), 0) > step or
+                    self.tabu_until.get((alt_cell, val), 0) > step)
+            if tabu and cost + delta >= best_cost:
+                continue
+            # Break ties at random, to avoid cycling between the same moves.
+            if best is None or delta < best[3]:
+                best, ties = option, 1
+            elif delta == best[3]:
+                ties += 1
+                if random.randrange(ties) == 0:
+                    best = option
+        if best is not None:
+            self.tabu_until[cell, val] = step + self.tenure
+            self.tabu_until[best[0], best[1]] = step + self.tenure
+        return best
+
+
+POLICIES = {'greedy': GreedyPolicy, 'annealing': AnnealingPolicy,
+            'tabu': TabuPolicy}
+
+
+@dataclasses.dataclass
+class SearchEvent:
+    """Passed to the progress callback of Solution.
+
+    kind is 'restart', 'improvement' (fewer conflicted cells than before
+    in this attempt), 'rate' (sent every RATE_SAMPLE_STEPS steps)
+    or 'solved'."""
+    kind: str
+    attempt: int
+    step: int  # Within the attempt.
+    total_steps: int
+    conflicted: int
+    seconds: float
+
+    @property
+    def steps_per_second(self):
+        return self.total_steps / self.seconds if self.seconds else 0.0
+
+
+@dataclasses.dataclass
+class SearchStats:
+    solved: bool = False
+    attempts: int = 0
+    total_steps: int = 0
+    improvements: int = 0
+    seconds: float = 0.0
+
+    @property
+    def steps_per_second(self):
+        return self.total_steps / self.seconds if self.seconds else 0.0
+
+
+def print_progress(event):
+    """A progress callback printing what the search is doing."""
+    if event.kind == 'restart':
+        print(f'Restart after {event.step} steps! '
+              f'Attempt number {event.attempt}.')
+    elif event.kind == 'improvement' and event.conflicted < 10:
+        print(f'Step {event.step}, attempt {event.attempt}.')
+        print(f'Number of conflicted cells={event.conflicted}')
+    elif event.kind == 'solved':
+        print(f'Solved! in {event.attempt} attempts, in {event.step} steps, '
+              f'{event.total_steps} total, '
+              f'{event.steps_per_second:.0f} steps per second.')
+
+
 class Solution:
+    def __init__(self, policy=None, callback=None):
+        """The search reports its progress by calling callback
+        with a SearchEvent, if given, and is silent otherwise."""
+        self.policy = GreedyPolicy() if policy is None else policy
+        self.callback = callback
+        self.stats = None
+
     def solveSudoku(self, board: List[List[str]]) -> None:
+        self.solve(board)
+
+    def solve(self, board):
+        """Fill in board, and return it together with the SearchStats."""
         # Initialization
+        # The shape of this board; these shadow the module-level defaults.
+        N_h, N_v, ALPHABET = board_shape(len(board))
+        N = N_h * N_v
+        alphabet_dict = {ALPHABET[i]: i for i in range(N)}
         solution=[[None for _ in range(N)] for _ in range(N)]
         row_allowed_values = [{v for v in range(N)} for _ in range(N)]
         column_allowed_values = [{v for v in range(N)} for _ in range(N)]
         box_allowed_values = [{v for v in range(N)} for _ in range(N)]
-        row_val_cells = [[set() for _ in range(N)] for _ in range(N)]
-        column_val_cells = [[set() for _ in range(N)] for _ in range(N)]
-        box_val_cells = [[None for _ in range(N)] for _ in range(N)]
 
         # Utility functions.
         def box_number(x, y):
             return N_v * (x // N_v) + (y // N_h)
 
-        def is_row_conflicted(x, v):
-            return len(row_val_cells[x][v]) > 1
-
-        def is_column_conflicted(y, v):
-            return len(column_val_cells[y][v]) > 1
-
-        def is_conflicted(x, y):
-            v = solution[x][y]
-            return is_row_conflicted(x,v) or is_column_conflicted(y,v)
-
-        def update_conflicted(cells):
-            for x, y in cells:
-                if is_conflicted(x, y):
-                    conflicted.add((x, y))
-                else:
-                    if (x, y) in conflicted:
-                        conflicted.remove((x, y))
-
-        def swap_conflicted_update(x_1, y_1, v_1, x_2, y_2, v_2):
-            for x, y, v in product((x_1, x_2), (y_1, y_2), (v_1, v_2)):
-                update_conflicted(row_val_cells[x][v])
-                update_conflicted(column_val_cells[y][v])
+        # The conflicted cells are those whose value appears more than once
+        # in their row or column. We keep the number of cells with each value
+        # in each row and column, and update the conflicted cells only
+        # when one of these numbers goes between 1 and 2,
+        # so that putting a value into a cell or lifting it out is O(1).
+        def place(x, y, v):
+            cell = (x, y)
+            solution[x][y] = v
+            nonlocal cost
+            row_val_cells[x][v].add(cell)
+            row_count[x][v] += 1
+            if row_count[x][v] > 1:
+                cost += 1
+                if row_count[x][v] == 2:
+                    conflicted.update(row_val_cells[x][v])
+            column_val_cells[y][v].add(cell)
+            column_count[y][v] += 1
+            if column_count[y][v] > 1:
+                cost += 1
+                if column_count[y][v] == 2:
+                    conflicted.update(column_val_cells[y][v])
+            if row_count[x][v] > 1 or column_count[y][v] > 1:
+                conflicted.add(cell)
+
+        def lift(x, y, v):
+            nonlocal cost
+            cell = (x, y)
+            conflicted.discard(cell)
+            row_val_cells[x][v].remove(cell)
+            if row_count[x][v] > 1:
+                cost -= 1
+            row_count[x][v] -= 1
+            if row_count[x][v] == 1:
+                for other in row_val_cells[x][v]:
+                    if column_count[other[1]][v] < 2:
+                        conflicted.discard(other)
+            column_val_cells[y][v].remove(cell)
+            if column_count[y][v] > 1:
+                cost -= 1
+            column_count[y][v] -= 1
+            if column_count[y][v] == 1:
+                for other in column_val_cells[y][v]:
+                    if row_count[other[0]][v] < 2:
+                        conflicted.discard(other)
 
         # Collect forbidden values and copy to solution.
         for i in range(N):
@@ -111,9 +301,19 @@ class Solution:
                     column_allowed_values[j].remove(val)
                     box_allowed_values[box_number(i, j)].remove(val)
                     solution[i][j] = val
+        givens = [[solution[i][j] for j in range(N)] for i in range(N)]
 
         # Randomly fill each box and build tables to track where everything is.
         def preprocess():
+            nonlocal conflicted, row_val_cells, column_val_cells, \
+                row_count, column_count, box_val_cells, cost, best_cost
+            cost = 0
+            conflicted = SetList()
+            row_val_cells = [[set() for _ in range(N)] for _ in range(N)]
+            column_val_cells = [[set() for _ in range(N)] for _ in range(N)]
+            row_count = [[0] * N for _ in range(N)]
+            column_count = [[0] * N for _ in range(N)]
+            box_val_cells = [[None for _ in range(N)] for _ in range(N)]
             for box_num in range(N):
                 # Get values.
                 allowed_values = list(box_allowed_values[box_num])
@@ -126,54 +326,55 @@ class Solution:
                         # Fill the box.
                         if board[i][j] == BYE_SYMBOL:
                             v = allowed_values.pop()
-                            solution[i][j] = v
                         else:
-                            v = solution[i][j]
+                            v = givens[i][j]
 
                         # Track cells with value v in each row, column and box.
-                        row_val_cells[i][v].add((i, j))
-                        column_val_cells[j][v].add((i, j))
+                        place(i, j, v)
                         box_val_cells[box_num][v] = (i, j)  # always one per box
 
-            conflicted_cells = SetList()
-            for i in range(N):
-                for j in range(N):
-                    if is_conflicted(i, j):
-                        conflicted_cells.add((i, j))
-
-            number_conflicted_cells = len(conflicted_cells)
-            print(f'number of conflicted cells={number_conflicted_cells}')
-
-            return solution, conflicted_cells, number_conflicted_cells, \
-                   box_val_cells, row_val_cells, column_val_cells
+            best_cost = cost
+            policy.restart()
 
-        solution, conflicted, number_conflicted, \
-            box_val_cells, row_val_cells, column_val_cells = preprocess()
+        policy, callback = self.policy, self.callback
+        stats = self.stats = SearchStats()
+        conflicted = row_val_cells = column_val_cells = None
+        row_count = column_count = box_val_cells = None
+        cost = best_cost = 0
+        preprocess()
+        number_conflicted = len(conflicted)
 
         attempt_number = 1
         step = 1
         total_step = 1
         improvement_step = 1
+        start_time = time.perf_counter()
+
+        def report(kind):
+            callback(SearchEvent(kind, attempt_number, step,
+                                 total_step + step, len(conflicted),
+                                 time.perf_counter() - start_time))
+
         while attempt_number < MAX_ATTEMPTS:
 
             if not conflicted: # Victory lap.
-                print(f'Solved! in {attempt_number} attempts, in {step} steps, '
-                      f'{total_step+step} total, '
-                      f'last ratio {step/improvement_step}.')
+                stats.solved = True
                 for i, row in enumerate(board):
                     for j, val in enumerate(row):
                         board[i][j] = ALPHABET[solution[i][j]]
                 break
 
             step += 1
+            if (callback is not None
+                    and (total_step + step) % RATE_SAMPLE_STEPS == 0):
+                report('rate')
             if step > improvement_step*RESTART_RATIO and len(conflicted) < 10:
                 # Restart.
                 attempt_number += 1
-                print(f'Restart after {step} steps!'
-                      f' (Last improvement at {improvement_step}). '
-                      f'Attempt number {attempt_number}.')
-                solution, conflicted, number_conflicted, \
-                box_val_cells, row_val_cells, column_val_cells = preprocess()
+                preprocess()
+                number_conflicted = len(conflicted)
+                if callback is not None:
+                    report('restart')
 
                 total_step += step
                 step = 1
@@ -189,55 +390,100 @@ class Solution:
             val = solution[i][j]
             box_num = box_number(i, j)
 
-            # Choose the swap myopically.
-            min_conflict = 4*N
+            # Collect the possible swaps and let the policy choose.
+            options = []
+            row_count_i, column_count_j = row_count[i], column_count[j]
             for alt_val in box_allowed_values[box_num]:
                 if alt_val != val:
                     alt_i, alt_j = alt_cell = box_val_cells[box_num][alt_val]
-                    conflict = len(row_val_cells[i][alt_val]) +\
-                               len(column_val_cells[j][alt_val]) +\
-                               len(row_val_cells[alt_i][val]) +\
-                               len(column_val_cells[alt_j][val])
-                    if conflict < min_conflict:
-                        min_conflict = conflict
-                        new_i, new_j = new_cell = alt_cell
-                        new_val = alt_val
-
-            # Now swap and update including update conflicted.
-            # Remove.
-            row_val_cells[new_i][new_val].remove(new_cell)
-            column_val_cells[new_j][new_val].remove(new_cell)
-            row_val_cells[i][val].remove(cell)
-            column_val_cells[j][val].remove(cell)
-
-            # Swap.
-            new_val, val = val, new_val
-            solution[i][j] = val
-            solution[new_i][new_j] = new_val
-
-            # Add.
-            row_val_cells[new_i][new_val].add(new_cell)
-            column_val_cells[new_j][new_val].add(new_cell)
-            row_val_cells[i][val].add(cell)
-            column_val_cells[j][val].add(cell)
-
-            box_val_cells[box_num][val] = cell
-            box_val_cells[box_num][new_val] = new_cell
-
-            swap_conflicted_update(x_1=i, y_1=j, v_1=val,
-                                   x_2=new_i, y_2=new_j, v_2=new_val)
+                    conflict = row_count_i[alt_val] +\
+                               column_count_j[alt_val] +\
+                               row_count[alt_i][val] +\
+                               column_count[alt_j][val]
+                    delta = 0
+                    if alt_i != i:
+                        delta += (
+                            (row_count_i[alt_val] > 0) - (row_count_i[val] > 1)
+                            + (row_count[alt_i][val] > 0)
+                            - (row_count[alt_i][alt_val] > 1))
+                    if alt_j != j:
+                        delta += (
+                            (column_count_j[alt_val] > 0)
+                            - (column_count_j[val] > 1)
+                            + (column_count[alt_j][val] > 0)
+                            - (column_count[alt_j][alt_val] > 1))
+                    options.append((alt_cell, alt_val, conflict, delta))
+            if not options:
+                continue
+            choice = policy.choose(step, cell, val, options, cost, best_cost)
+            if choice is None:
+                continue
+            new_cell, new_val, _, _ = choice
+            new_i, new_j = new_cell
+
+            # Now swap, updating the counts and the conflicted cells.
+            lift(new_i, new_j, new_val)
+            lift(i, j, val)
+            place(new_i, new_j, val)
+            place(i, j, new_val)
+            box_val_cells[box_num][new_val] = cell
+            box_val_cells[box_num][val] = new_cell
+            best_cost = min(best_cost, cost)
 
             if len(conflicted) < number_conflicted:
                 number_conflicted = len(conflicted)
                 if number_conflicted > 0:
                     improvement_step = step
-                if number_conflicted < 10:
-                    print(f'Step {step}, attempt {attempt_number}.')
-                    print(f'Number of conflicted cells={number_conflicted}')
-                    print(f'Conflicted cells: {conflicted}')
+                stats.improvements += 1
+                if callback is not None:
+                    report('improvement')
+
+        stats.attempts = attempt_number
+        stats.total_steps = total_step + step
+        stats.seconds = time.perf_counter() - start_time
+        if stats.solved and callback is not None:
+            report('solved')
+        return board, stats
+
+
+def board_from_file(file_name):
+    board = []
+    with open(file_name) as f:
+        for line in f.read().splitlines():
+            if line:
+                raw_row = line.split()
+                row = [BYE_SYMBOL if x == '0' else x for x in raw_row]
+                board.append(row)
+    return board
+
+
+def benchmark(policy_names=tuple(POLICIES), runs=3, file_names=None):
+    """Print the mean time to solution of each policy on each instance,
+    over runs differently seeded runs."""
+    if file_names is None:
+        file_names = sorted(glob.glob('test-instances/*.txt'))
+    print('instance  ' + ''.join(f'{name:>12}' for name in policy_names))
+    for file_name in file_names:
+        board = board_from_file(file_name)
+        times = []
+        for name in policy_names:
+            start = time.perf_counter()
+            for seed in range(runs):
+                random.seed(seed)
+                Solution(POLICIES[name]()).solveSudoku(
+                    [row[:] for row in board])
+            times.append((time.perf_counter() - start) / runs)
+        print(f'{os.path.basename(file_name):10}'
+              + ''.join(f'{seconds:11.3f}s' for seconds in times))
 
 
 def main():
+    # python sudoku-local-search.py benchmark
+    # compares the acceptance policies on the test instances.
+    if sys.argv[1:] == ['benchmark']:
+        benchmark()
+        return
+
     board_1 = [
             [".",".",".",".",".",".",".","1","."],
             [".",".",".",".",".","2",".",".","3"],
@@ -268,17 +514,10 @@ def main():
                ["5",".","3","7",".",".",".",".","8"],
                ["4","7",".",".",".","1",".",".","."]]
 
-    file_name = 'test-instances/s08a.txt'
-    board_4 = []
-    with open(file_name) as f:
-        for line in f.read().splitlines():
-            if line:
-                raw_row = line.split(' ')[:-1]
-                row = [BYE_SYMBOL if x == '0' else x for x in raw_row]
-                board_4.append(row)
+    board_4 = board_from_file('test-instances/s08a.txt')
 
     board = board_3
-    sol = Solution()
+    sol = Solution(callback=print_progress)
     sol.solveSudoku(board)
     for row in board:
         print(row)
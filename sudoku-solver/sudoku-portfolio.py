@@ -0,0 +1,142 @@
+""" This is a portfolio of Sudoku solvers.
+
+The backtracking solver of sudoku-solver.py and the local search solver
+of sudoku-local-search.py have very different running times
+depending on the instance, and it is hard to tell in advance which one
+will do better.
+The code below runs the backtracking solver and several differently seeded
+copies of the local search at the same time, each in its own process,
+takes the first valid solution found and stops the rest.
+
+For more details, see the README in the file's github folder.
+"""
+import importlib.util
+import multiprocessing
+import os
+import random
+import sys
+import traceback
+from sys import stdout
+
+LOCAL_SEARCH_RUNS = 3
+
+
+def load_script(file_name, module_name):
+    """Import one of the solver scripts of this folder as a module."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), file_name)
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+backtracking = load_script('sudoku-solver.py', 'sudoku_solver')
+local_search = load_script('sudoku-local-search.py', 'sudoku_local_search')
+
+
+def run_backtracking(board, engine):
+    return backtracking.ENGINES[engine](backtracking.Sudoku(board))
+
+
+def run_local_search(board, seed):
+    random.seed(seed)
+    _, stats = local_search.Solution().solve(board)
+    return stats.solved
+
+
+SOLVERS = {'backtracking': run_backtracking, 'local search': run_local_search}
+# The solvers that fail only if there is no solution.
+COMPLETE_SOLVERS = {'backtracking'}
+# The outcomes a worker reports.
+SOLVED, FAILED, ERRORED = 'solved', 'failed', 'errored'
+
+
+def is_solution(puzzle, board):
+    """Check that board fills in puzzle without violating the constraints."""
+    shape = backtracking.Shape.for_size(len(puzzle))
+    size = shape.size
+    alphabet = set(shape.alphabet)
+    if any(puzzle[i][j] not in (backtracking.EMPTY_SYMBOL, board[i][j])
+           for i in range(size) for j in range(size)):
+        return False
+    units = [[(i, j) for j in range(size)] for i in range(size)]
+    units += [[(i, j) for i in range(size)] for j in range(size)]
+    units += [[(i, j) for i in range(size) for j in range(size)
+               if shape.box_number(i, j) == box]
+              for box in range(size)]
+    return all({board[i][j] for i, j in unit} == alphabet for unit in units)
+
+
+def _worker(name, solver, argument, puzzle, results):
+    board = [row[:] for row in puzzle]
+    try:
+        outcome = SOLVED if SOLVERS[solver](board, argument) else FAILED
+    except Exception:
+        # A result must be sent anyway, or solve_portfolio waits forever.
+        # An error proves nothing about the puzzle, even from a complete
+        # solver, so it only drops this entrant from the race.
+        traceback.print_exc()
+        outcome = ERRORED
+    results.put((name, solver, outcome, board))
+
+
+def solve_portfolio(board, engine='mrv', local_search_runs=LOCAL_SEARCH_RUNS,
+                    seed=None):
+    """Race the solvers on board and fill it in with the first solution.
+
+    Return the name of the solver that won, or None if none of them
+    found a solution. A complete solver failing (rather than raising
+    an exception) proves there is none, so then the others are stopped
+    at once."""
+    rng = random.Random(seed)
+    entrants = [('backtracking', 'backtracking', engine)]
+    entrants += [(f'local search {run}', 'local search', rng.getrandbits(32))
+                 for run in range(local_search_runs)]
+
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_worker, daemon=True,
+                                       args=(name, solver, argument,
+                                             board, results))
+               for name, solver, argument in entrants]
+    for worker in workers:
+        worker.start()
+    winner = None
+    try:
+        for _ in workers:
+            name, solver, outcome, solution = results.get()
+            if outcome == SOLVED and is_solution(board, solution):
+                winner = name
+                for i, row in enumerate(solution):
+                    board[i][:] = row
+                break
+            if outcome == FAILED and solver in COMPLETE_SOLVERS:
+                break
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
+    return winner
+
+
+def main():
+    board = [
+        [".", ".", ".", ".", ".", ".", ".", "1", "."],
+        [".", ".", ".", ".", ".", "2", ".", ".", "3"],
+        [".", ".", ".", "4", ".", ".", ".", ".", "."],
+        [".", ".", ".", ".", ".", ".", "5", ".", "."],
+        ["4", ".", "1", "6", ".", ".", ".", ".", "."],
+        [".", ".", "7", "1", ".", ".", ".", ".", "."],
+        [".", "5", ".", ".", ".", ".", "2", ".", "."],
+        [".", ".", ".", ".", "8", ".", ".", "4", "."],
+        [".", "3", ".", "9", "1", ".", ".", ".", "."]
+    ]
+    winner = solve_portfolio(board)
+    stdout.write(f'Solved by {winner}.\n')
+    for row in board:
+        stdout.write("".join(row) + "\n")
+
+
+if __name__ == '__main__':
+    main()
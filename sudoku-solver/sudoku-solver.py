@@ -7,19 +7,22 @@ https://leetcode.com/problems/sudoku-solver/
 The code below implements a backtracking algorithm with the
 "most constrained first" heuristic for choosing which cell to fill.
 
-It  maintains the board as a priority queue of cells,
-ordered by number of possible values that can be put into that cell
-without violating the sudoku constraints.
+It  maintains bitmasks of the values used in each row, column and box,
+so that the number of possible values of a cell is a popcount.
 We  try to fill in one of the most constrained cells,
-update the priority queue, and recurse.
+update the bitmasks, and go on to the next cell.
 
 For more details, see the README in the file's github folder.
 """
 from __future__ import annotations
-from sys import stdout
+from sys import argv, stdout
 import dataclasses
+import os
+import time
 from itertools import product
+from multiprocessing import Pool
 
+# The shape of boards of size SIZE, unless given otherwise.
 HORIZONTAL_SIZE = 3
 VERTICAL_SIZE = 3
 SIZE = HORIZONTAL_SIZE * VERTICAL_SIZE
@@ -27,183 +30,729 @@ ALPHABET = tuple(map(str, range(1, SIZE+1)))
 EMPTY_SYMBOL = '.'
 
 
-@dataclasses.dataclass(unsafe_hash=True)
-class Cell:
-    x_pos: int
-    y_pos: int
-    possible_values: set[str] = dataclasses.field(compare=False, repr=False)
-    neighbours: set[Cell] = dataclasses.field(init=False, compare=False, repr=False)
-
-    def ordered_possible_values(self):
-        def how_constraining(value):
-            return sum(
-                value in neighbour.possible_values
-                for neighbour in self.neighbours
-            )
-        return sorted(self.possible_values, key=how_constraining)
-
-
-def neighbour_positions(x_pos, y_pos):
-    for neighbor_y in range(SIZE):
-        yield x_pos, neighbor_y
-    for neighbor_x in range(SIZE):
-        yield neighbor_x, y_pos
-    top_left_x = (x_pos // HORIZONTAL_SIZE) * HORIZONTAL_SIZE
-    top_left_y = (y_pos // VERTICAL_SIZE) * VERTICAL_SIZE
-    for delta_x in range(HORIZONTAL_SIZE):
-        for delta_y in range(VERTICAL_SIZE):
-            yield top_left_x + delta_x, top_left_y + delta_y
-
-
-def allowed_values(x_pos, y_pos, board):
-    """Returns all values that the entry (x_pos,y_pos) may be given
-    without violating the sudoku constraints."""
-    forbidden_values = {board[k][l] for k, l in neighbour_positions(x_pos, y_pos)}
-    return set(ALPHABET) - forbidden_values
-
-
-def build_que(board):
-    table = table_of_cells(board)
-    # Processes the table of cells into a queue of cells.
-    board_que = [set() for _ in range(SIZE + 1)]
-    for x_pos, y_pos in product(range(SIZE), range(SIZE)):
-        cell = table[x_pos][y_pos]
-        if cell is None:
-            continue
-        board_que[len(cell.possible_values)].add(cell)
-    return board_que
-
-
-def table_of_cells(board):
-    """Make a table of cell objects from the board"""
-    table = [[None for _ in range(SIZE)] for _ in range(SIZE)]
+@dataclasses.dataclass()
+class Shape:
+    """The shape of a sudoku: boxes are horizontal_size rows tall and
+    vertical_size columns wide, and the values are the symbols of alphabet
+    (by default '1', '2', ..., str(size)).
+
+    Sets of values are stored as bitmasks: value alphabet[i] is the bit 1 << i.
+    """
+    horizontal_size: int
+    vertical_size: int
+    alphabet: tuple[str, ...] = None
+    size: int = dataclasses.field(init=False)
+    full_mask: int = dataclasses.field(init=False, repr=False)
+    value_to_bit: dict[str, int] = dataclasses.field(init=False, repr=False)
+    bit_to_value: dict[int, str] = dataclasses.field(init=False, repr=False)
 
-    for x_pos, y_pos in product(range(SIZE), range(SIZE)):
-        if board[x_pos][y_pos] != EMPTY_SYMBOL:
-            continue
-        table[x_pos][y_pos] = Cell(x_pos, y_pos,
-                                   allowed_values(x_pos, y_pos, board))
-    # Set the neighbors of the cell objects.
-    for x_pos, y_pos in product(range(SIZE), range(SIZE)):
-        if table[x_pos][y_pos] is None:
-            continue
-        table[x_pos][y_pos].neighbours = {table[k][l]
-                                          for (k, l) in neighbour_positions(x_pos, y_pos)
-                                          if ((k, l) != (x_pos, y_pos)
-                                          and table[k][l] is not None)}
-    return table
+    def __post_init__(self):
+        self.size = self.horizontal_size * self.vertical_size
+        if self.alphabet is None:
+            self.alphabet = tuple(map(str, range(1, self.size+1)))
+        self.full_mask = (1 << self.size) - 1
+        self.value_to_bit = {value: 1 << i
+                             for i, value in enumerate(self.alphabet)}
+        self.bit_to_value = {bit: value
+                             for value, bit in self.value_to_bit.items()}
+
+    @classmethod
+    def for_size(cls, size):
+        """The shape with HORIZONTAL_SIZE x VERTICAL_SIZE boxes if size
+        is SIZE, and with boxes as close to square as possible otherwise
+        (e.g. 2 x 3 boxes for size 6, 4 x 4 for size 16)."""
+        if size == SIZE:
+            return cls(HORIZONTAL_SIZE, VERTICAL_SIZE, ALPHABET)
+        horizontal_size = max(h for h in range(1, int(size ** 0.5) + 1)
+                              if size % h == 0)
+        return cls(horizontal_size, size // horizontal_size)
+
+    def box_number(self, x_pos, y_pos):
+        # Boxes are horizontal_size rows tall and vertical_size columns wide,
+        # so there are size // vertical_size = horizontal_size boxes per band.
+        return ((x_pos // self.horizontal_size) * self.horizontal_size
+                + y_pos // self.vertical_size)
+
+    def neighbour_positions(self, x_pos, y_pos):
+        for neighbor_y in range(self.size):
+            yield x_pos, neighbor_y
+        for neighbor_x in range(self.size):
+            yield neighbor_x, y_pos
+        top_left_x = (x_pos // self.horizontal_size) * self.horizontal_size
+        top_left_y = (y_pos // self.vertical_size) * self.vertical_size
+        for delta_x in range(self.horizontal_size):
+            for delta_y in range(self.vertical_size):
+                yield top_left_x + delta_x, top_left_y + delta_y
+
+    def format_row(self, row):
+        """Write out a row, with spaces between symbols if some of them
+        are longer than one character."""
+        if max(map(len, self.alphabet)) > 1:
+            return " ".join(row)
+        return "".join(row)
+
+    def format_board(self, board):
+        """Write out a board on one line."""
+        separator = " " if max(map(len, self.alphabet)) > 1 else ""
+        return separator.join(self.format_row(row) for row in board)
+
+
+def iterate_bits(mask):
+    """Yield the set bits of mask, lowest first."""
+    while mask:
+        bit = mask & -mask
+        yield bit
+        mask ^= bit
 
 
 @dataclasses.dataclass()
 class Sudoku:
+    """The board together with the bitmasks of values used
+    in each row, column and box, and the list of unfilled cells.
+
+    The shape is found from the size of the board unless given.
+    The possible values of an unfilled cell are not stored,
+    they are the values not used by any of its row, column or box,
+    and not excluded for the cell by constraint propagation.
+    With propagation on, changes made by propagate() are recorded
+    on the trail, to be reverted by undo()."""
     board: list[list[str]]
-    unfilled: list[set[Cell]] = dataclasses.field(init=False)
+    propagation: bool = False
+    shape: Shape = None
+    row_used: list[int] = dataclasses.field(init=False, repr=False)
+    column_used: list[int] = dataclasses.field(init=False, repr=False)
+    box_used: list[int] = dataclasses.field(init=False, repr=False)
+    unfilled: list[tuple[int, int, int]] = dataclasses.field(init=False,
+                                                            repr=False)
+    excluded: list[list[int]] = dataclasses.field(init=False, repr=False)
+    trail: list[tuple] = dataclasses.field(init=False, repr=False)
+    nodes: int = dataclasses.field(init=False, default=0)
+    deduced: int = dataclasses.field(init=False, default=0)
+    nodes_saved: int = dataclasses.field(init=False, default=0)
 
     def __post_init__(self):
-        self.unfilled = build_que(self.board)
+        if self.shape is None:
+            self.shape = Shape.for_size(len(self.board))
+        size = self.shape.size
+        self.row_used = [0] * size
+        self.column_used = [0] * size
+        self.box_used = [0] * size
+        self.excluded = [[0] * size for _ in range(size)]
+        self.trail = []
+        self.unfilled = []
+        for x_pos, y_pos in product(range(size), range(size)):
+            box = self.shape.box_number(x_pos, y_pos)
+            value = self.board[x_pos][y_pos]
+            if value == EMPTY_SYMBOL:
+                self.unfilled.append((x_pos, y_pos, box))
+                continue
+            bit = self.shape.value_to_bit[value]
+            self.row_used[x_pos] |= bit
+            self.column_used[y_pos] |= bit
+            self.box_used[box] |= bit
+
+    def possible_values(self, x_pos, y_pos, box):
+        """The bitmask of values that the entry (x_pos, y_pos) may be given
+        without violating the sudoku constraints."""
+        return self.shape.full_mask & ~(self.row_used[x_pos] | self.column_used[y_pos]
+                             | self.box_used[box] | self.excluded[x_pos][y_pos])
+
+    def fill(self, slot, bit):
+        """Put the value bit into the cell sudoku.unfilled[slot]."""
+        self.unfilled[slot], self.unfilled[-1] = \
+            self.unfilled[-1], self.unfilled[slot]
+        x_pos, y_pos, box = cell = self.unfilled.pop()
+        self.row_used[x_pos] |= bit
+        self.column_used[y_pos] |= bit
+        self.box_used[box] |= bit
+        self.board[x_pos][y_pos] = self.shape.bit_to_value[bit]
+        self.trail.append((cell, slot, bit))
+
+    def exclude(self, x_pos, y_pos, bits):
+        """Rule out the values bits for the cell (x_pos, y_pos)."""
+        # The trail keeps the previous mask, so that undo restores it
+        # even if some of the values were ruled out already.
+        self.trail.append(((x_pos, y_pos), None, self.excluded[x_pos][y_pos]))
+        self.excluded[x_pos][y_pos] |= bits
+
+    def undo(self, mark):
+        """Revert the changes on the trail after its first mark entries."""
+        while len(self.trail) > mark:
+            cell, slot, bits = self.trail.pop()
+            if slot is None:
+                x_pos, y_pos = cell
+                self.excluded[x_pos][y_pos] = bits
+                continue
+            x_pos, y_pos, box = cell
+            self.row_used[x_pos] ^= bits
+            self.column_used[y_pos] ^= bits
+            self.box_used[box] ^= bits
+            self.board[x_pos][y_pos] = EMPTY_SYMBOL
+            self.unfilled.append(cell)
+            self.unfilled[slot], self.unfilled[-1] = \
+                self.unfilled[-1], self.unfilled[slot]
+
+    def ordered_possible_values(self, x_pos, y_pos, box):
+        """The possible values as bits, least constraining first."""
+        neighbours = set(self.shape.neighbour_positions(x_pos, y_pos))
+        masks = [self.possible_values(k, l, other_box)
+                 for k, l, other_box in self.unfilled
+                 if (k, l) in neighbours and (k, l) != (x_pos, y_pos)]
+
+        def how_constraining(bit):
+            return sum(bool(bit & mask) for mask in masks)
+        return sorted(iterate_bits(self.possible_values(x_pos, y_pos, box)),
+                      key=how_constraining)
+
+
+def most_constrained(sudoku):
+    """Return the position in sudoku.unfilled of a cell with the fewest
+    possible values, and these values.
+
+    Ties go to the cell that comes first in sudoku.unfilled.
+    We stop early only on a cell with no possible values,
+    since then the branch has failed."""
+    row_used, column_used, box_used, excluded = \
+        sudoku.row_used, sudoku.column_used, sudoku.box_used, sudoku.excluded
+    full_mask = sudoku.shape.full_mask
+    best_slot, best_count, best_mask = -1, sudoku.shape.size + 1, 0
+    for slot, (x_pos, y_pos, box) in enumerate(sudoku.unfilled):
+        mask = full_mask & ~(row_used[x_pos] | column_used[y_pos]
+                             | box_used[box] | excluded[x_pos][y_pos])
+        count = mask.bit_count()
+        if count < best_count:
+            best_slot, best_count, best_mask = slot, count, mask
+            if count == 0:
+                break
+    return best_slot, best_mask
+
+
+def _search(sudoku, limit=None, keep_solution=False):
+    """Backtrack over the values of most constrained cells, and return the
+    number of solutions found, stopping once limit of them are found.
+
+    With keep_solution, stop at the first solution and leave it filled in.
+    Otherwise every change is undone before returning.
+
+    The search is iterative, so that its depth (the number of unfilled
+    cells) is not limited by the recursion limit. For every cell it has
+    filled, the stack holds its slot in the unfilled list, the cell,
+    the values left to try, the value being tried, and the trail mark
+    to undo propagation back to."""
+    unfilled, board = sudoku.unfilled, sudoku.board
+    row_used, column_used, box_used = \
+        sudoku.row_used, sudoku.column_used, sudoku.box_used
+    stack = []
+    count = 0
+    while True:
+        # Go down: take a most constrained cell out of the unfilled list.
+        if not unfilled:
+            count += 1
+            if keep_solution:
+                for _, (x_pos, y_pos, _), _, bit, _ in stack:
+                    board[x_pos][y_pos] = sudoku.shape.bit_to_value[bit]
+                return count
+        else:
+            slot, mask = most_constrained(sudoku)
+            if mask:
+                unfilled[slot], unfilled[-1] = unfilled[-1], unfilled[slot]
+                stack.append([slot, unfilled.pop(), mask, 0,
+                              len(sudoku.trail)])
+
+        # Try the next value of the deepest cell. Once all its values
+        # have failed, put the cell back and go up to the cell before it.
+        while stack:
+            frame = stack[-1]
+            slot, cell, mask, bit, mark = frame
+            x_pos, y_pos, box = cell
+            if bit:
+                sudoku.undo(mark)
+                row_used[x_pos] ^= bit
+                column_used[y_pos] ^= bit
+                box_used[box] ^= bit
+            if mask and (limit is None or count < limit):
+                # Alternatively, take the values in the order of
+                # sudoku.ordered_possible_values(x_pos, y_pos, box)
+                # to use the "least constraining" heuristic.
+                bit = mask & -mask
+                frame[2], frame[3] = mask ^ bit, bit
+                sudoku.nodes += 1
+                row_used[x_pos] |= bit
+                column_used[y_pos] |= bit
+                box_used[box] |= bit
+                # Deduce what we can, then go down if nothing failed.
+                if not sudoku.propagation or propagate(sudoku):
+                    break
+                continue
+            stack.pop()
+            unfilled.append(cell)
+            unfilled[slot], unfilled[-1] = unfilled[-1], unfilled[slot]
+        else:
+            return count
 
 
 def solve(sudoku):
-    """Check if done and find a most constrained cell otherwise."""
-    if sudoku.unfilled[0]:
-        return False
-    d = 1
-    while not sudoku.unfilled[d]:
-        d += 1
-        if d == SIZE + 1:
+    """Fill in the sudoku and return True, or return False,
+    leaving it as it was, if it has no solution."""
+    return _search(sudoku, limit=1, keep_solution=True) > 0
+
+
+def propagate(sudoku):
+    """Fill in and rule out the values forced by the constraints,
+    until nothing changes. Return False if a contradiction is found.
+
+    We use naked singles (a cell with one possible value),
+    hidden singles (a value with one possible cell in a row, column or box)
+    and pointing (if the possible cells for a value in a box all lie in
+    one row or column, the value is ruled out in the rest of that line).
+    Every change goes on sudoku.trail."""
+    size, full_mask, value_to_bit = \
+        sudoku.shape.size, sudoku.shape.full_mask, sudoku.shape.value_to_bit
+    while True:
+        forced, ruled_out = [], []
+        row_cells = [[] for _ in range(size)]
+        column_cells = [[] for _ in range(size)]
+        box_cells = [[] for _ in range(size)]
+        for cell in sudoku.unfilled:
+            x_pos, y_pos, box = cell
+            mask = sudoku.possible_values(x_pos, y_pos, box)
+            if not mask:
+                return False
+            if not mask & (mask - 1):
+                forced.append((cell, mask))
+            row_cells[x_pos].append((cell, mask))
+            column_cells[y_pos].append((cell, mask))
+            box_cells[box].append((cell, mask))
+
+        # Hidden singles.
+        for units, used in ((row_cells, sudoku.row_used),
+                            (column_cells, sudoku.column_used),
+                            (box_cells, sudoku.box_used)):
+            for unit, cells in enumerate(units):
+                once, twice = 0, 0
+                for _, mask in cells:
+                    twice |= once & mask
+                    once |= mask
+                if once | used[unit] != full_mask:
+                    return False  # A value has no place left in this unit.
+                hidden = once & ~twice
+                if hidden:
+                    forced.extend((cell, mask & hidden)
+                                  for cell, mask in cells if mask & hidden)
+
+        # Pointing.
+        for box, cells in enumerate(box_cells):
+            for coordinate, line_cells in ((0, row_cells), (1, column_cells)):
+                line_masks = {}
+                for cell, mask in cells:
+                    line = cell[coordinate]
+                    line_masks[line] = line_masks.get(line, 0) | mask
+                for line, line_mask in line_masks.items():
+                    others = 0
+                    for other_line, other_mask in line_masks.items():
+                        if other_line != line:
+                            others |= other_mask
+                    confined = line_mask & ~others
+                    if confined:
+                        ruled_out.extend(
+                            (cell, mask & confined)
+                            for cell, mask in line_cells[line]
+                            if cell[2] != box and mask & confined)
+
+        if not forced and not ruled_out:
             return True
-    current_cell = sudoku.unfilled[d].pop()
-
-    # Prepare for the recursion.
-    for neighbour in current_cell.neighbours:
-        neighbour.neighbours.remove(current_cell)
-
-    '''Iterate over possible values trying to fill with them.'''
-    for tentative_value in current_cell.possible_values:
-        # Alternatively, iterate over current_cell.ordered_possible_values()
-        # to use the "least constraining" heuristic.
-        modified_neighbours = fill_cell_neighbours(sudoku, current_cell,
-                                                   tentative_value)
-
-        # See if smaller sudoku is solved. If not, undo the changes.
-        if solve(sudoku):
-            sudoku.board[current_cell.x_pos][current_cell.y_pos] = tentative_value
-            return True
-        else:
-            unfill_cell_neighbours(sudoku, tentative_value,
-                                   modified_neighbours)
-
-    # All values failed. This means we should've chosen a different value
-    # for one of the previous cells. We now undo the changes to the
-    # priority queue, to restore state for backtracking.
-    sudoku.unfilled[d].add(current_cell)
-    for neighbour in current_cell.neighbours:
-        neighbour.neighbours.add(current_cell)
-
-    # Indicate branch failure.
+        for cell, bits in forced:
+            x_pos, y_pos, box = cell
+            if bits & (bits - 1):
+                return False  # The only place for two values.
+            if sudoku.board[x_pos][y_pos] != EMPTY_SYMBOL:
+                if value_to_bit[sudoku.board[x_pos][y_pos]] != bits:
+                    return False
+                continue  # Forced more than once in this round.
+            mask = sudoku.possible_values(x_pos, y_pos, box)
+            if not mask & bits:
+                return False
+            sudoku.fill(sudoku.unfilled.index(cell), bits)
+            sudoku.deduced += 1
+            # The search would have guessed here, trying up to every value.
+            sudoku.nodes_saved += mask.bit_count()
+        for (x_pos, y_pos, _), bits in ruled_out:
+            if sudoku.board[x_pos][y_pos] != EMPTY_SYMBOL:
+                if value_to_bit[sudoku.board[x_pos][y_pos]] & bits:
+                    return False
+                continue
+            # The same values may be ruled out from two boxes in one round,
+            # but must go on the trail only once.
+            bits &= ~sudoku.excluded[x_pos][y_pos]
+            if bits:
+                sudoku.exclude(x_pos, y_pos, bits)
+                sudoku.nodes_saved += bits.bit_count()
+
+
+def solve_propagating(sudoku):
+    """Solve with constraint propagation after every assignment."""
+    sudoku.propagation = True
+    if propagate(sudoku) and solve(sudoku):
+        return True
+    sudoku.undo(0)
     return False
 
 
-def fill_cell_neighbours(sudoku, current_cell, tentative_value):
-    """Restrict possible values of neighbors.
-    Record which neighbors are affected for backtracking.
-    Return the set of affected neighbours."""
-    modified_neighbours = set()
-    for nbr in current_cell.neighbours:
-        if tentative_value in nbr.possible_values:
-            modified_neighbours.add(nbr)
-            sudoku.unfilled[len(nbr.possible_values)].remove(nbr)
-            nbr.possible_values.remove(tentative_value)
-            sudoku.unfilled[len(nbr.possible_values)].add(nbr)
-    return modified_neighbours
-
-
-def unfill_cell_neighbours(sudoku, tentative_value, modified_neighbours):
-    for neighbour in modified_neighbours:
-        sudoku.unfilled[len(neighbour.possible_values)].remove(neighbour)
-        neighbour.possible_values.add(tentative_value)
-        sudoku.unfilled[len(neighbour.possible_values)].add(neighbour)
+def count_solutions(sudoku, limit=None):
+    """Return the number of solutions of the sudoku, or limit if there are
+    at least that many. The sudoku is left unsolved.
+
+    Propagation only rules out values that cannot lead to a solution,
+    so the count is the same with or without it."""
+    mark = len(sudoku.trail)
+    count = 0
+    if not sudoku.propagation or propagate(sudoku):
+        count = _search(sudoku, limit)
+    sudoku.undo(mark)
+    return count
+
+
+def has_unique_solution(board, shape=None):
+    """Check whether board has exactly one solution."""
+    return count_solutions(Sudoku(board, propagation=True, shape=shape),
+                           limit=2) == 1
+
+
+def _count_branch(task):
+    board, shape, limit, propagation = task
+    return count_solutions(Sudoku(board, propagation, shape), limit)
+
+
+def count_solutions_parallel(board, limit=None, propagation=True,
+                             shape=None, processes=None):
+    """count_solutions with the top-level branches, one for each possible
+    value of a most constrained cell, counted in a pool of processes."""
+    sudoku = Sudoku([row[:] for row in board], propagation, shape)
+    if not sudoku.unfilled:
+        return 1
+    slot, mask = most_constrained(sudoku)
+    x_pos, y_pos, _ = sudoku.unfilled[slot]
+    tasks = []
+    for bit in iterate_bits(mask):
+        branch = [row[:] for row in board]
+        branch[x_pos][y_pos] = sudoku.shape.bit_to_value[bit]
+        tasks.append((branch, sudoku.shape, limit, propagation))
+
+    count = 0
+    with Pool(processes) as pool:
+        for branch_count in pool.imap_unordered(_count_branch, tasks):
+            count += branch_count
+            if limit is not None and count >= limit:
+                return limit
+    return count
+
+
+class DancingLinks:
+    """Knuth's Algorithm X for exact cover, with the matrix stored as
+    Dancing Links: circular doubly linked lists of its 1-entries.
+
+    The links are kept in flat lists indexed by node number.
+    Node 0 is the root, nodes 1 to n_columns are the column headers,
+    and the nodes of the rows come after them."""
+
+    def __init__(self, n_columns):
+        self.left = [n_columns] + list(range(n_columns))
+        self.right = list(range(1, n_columns + 1)) + [0]
+        self.up = list(range(n_columns + 1))
+        self.down = list(range(n_columns + 1))
+        self.column = list(range(n_columns + 1))
+        self.size = [0] * (n_columns + 1)
+        self.row_id = [-1] * (n_columns + 1)
+        self.solution = []
+        self.nodes = 0
+
+    def add_row(self, row_id, columns):
+        """Add a row with 1s in the given columns (numbered from 1)."""
+        first = len(self.column)
+        for k, c in enumerate(columns):
+            node = first + k
+            self.left.append(node - 1 if k else first + len(columns) - 1)
+            self.right.append(node + 1 if k < len(columns) - 1 else first)
+            # Insert at the bottom of column c.
+            self.up.append(self.up[c])
+            self.down.append(c)
+            self.down[self.up[c]] = node
+            self.up[c] = node
+            self.column.append(c)
+            self.row_id.append(row_id)
+            self.size[c] += 1
+
+    def cover(self, c):
+        left, right, up, down, column, size = \
+            self.left, self.right, self.up, self.down, self.column, self.size
+        right[left[c]] = right[c]
+        left[right[c]] = left[c]
+        i = down[c]
+        while i != c:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                size[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(self, c):
+        left, right, up, down, column, size = \
+            self.left, self.right, self.up, self.down, self.column, self.size
+        i = up[c]
+        while i != c:
+            j = left[i]
+            while j != i:
+                size[column[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[c]] = c
+        left[right[c]] = c
+
+    def search(self):
+        """Look for an exact cover, recording the ids of its rows
+        in self.solution. Return whether one was found.
+
+        The search is iterative, so that its depth (the number of rows
+        of a cover) is not limited by the recursion limit: the column
+        chosen at each level and the row tried in it are on a stack."""
+        right, left, down, size, column = \
+            self.right, self.left, self.down, self.size, self.column
+        stack = []
+        while True:
+            c = right[0]
+            if c == 0:
+                return True
+            # Choose a column with fewest 1s: the exact cover analogue of
+            # the "most constrained first" heuristic.
+            best, best_size = c, size[c]
+            while c and best_size:
+                if size[c] < best_size:
+                    best, best_size = c, size[c]
+                c = right[c]
+            if best_size:
+                self.cover(best)
+                r = down[best]
+            else:
+                best = None
+
+            # Try the next row of the column of the deepest level,
+            # backtracking from the levels whose rows have all failed.
+            while True:
+                if best is None:
+                    if not stack:
+                        return False
+                    best, r = stack.pop()
+                    self.solution.pop()
+                    j = left[r]
+                    while j != r:
+                        self.uncover(column[j])
+                        j = left[j]
+                    r = down[r]
+                if r != best:
+                    break
+                self.uncover(best)
+                best = None
+
+            self.nodes += 1
+            self.solution.append(self.row_id[r])
+            j = right[r]
+            while j != r:
+                self.cover(column[j])
+                j = right[j]
+            stack.append((best, r))
+
+
+def exact_cover_columns(size, x_pos, y_pos, box, bit_index):
+    """The four constraints met by putting value number bit_index
+    into the cell (x_pos, y_pos): the cell is filled, and the value
+    appears in the row, the column and the box."""
+    return (x_pos * size + y_pos,
+            size * size + x_pos * size + bit_index,
+            2 * size * size + y_pos * size + bit_index,
+            3 * size * size + box * size + bit_index)
+
+
+def solve_exact_cover(sudoku):
+    """Solve the sudoku as an exact cover problem with Dancing Links.
+
+    Only the constraints not already met by the filled cells become columns,
+    and only the possible values of unfilled cells become rows."""
+    candidates = []
+    for x_pos, y_pos, box in sudoku.unfilled:
+        for bit in iterate_bits(sudoku.possible_values(x_pos, y_pos, box)):
+            candidates.append((x_pos, y_pos, box, bit))
+
+    # Number the columns that still need to be covered.
+    size = sudoku.shape.size
+    constraint_to_column = {}
+    for x_pos, y_pos, box in sudoku.unfilled:
+        constraint_to_column[x_pos * size + y_pos] = 0
+    for position in range(size):
+        for offset, used in ((size * size, sudoku.row_used),
+                             (2 * size * size, sudoku.column_used),
+                             (3 * size * size, sudoku.box_used)):
+            for bit_index in range(size):
+                if not used[position] >> bit_index & 1:
+                    constraint_to_column[offset + position * size
+                                         + bit_index] = 0
+    for column, constraint in enumerate(sorted(constraint_to_column), 1):
+        constraint_to_column[constraint] = column
+
+    links = DancingLinks(len(constraint_to_column))
+    for row_id, (x_pos, y_pos, box, bit) in enumerate(candidates):
+        constraints = exact_cover_columns(size, x_pos, y_pos, box,
+                                          bit.bit_length() - 1)
+        links.add_row(row_id, [constraint_to_column[constraint]
+                               for constraint in constraints])
+
+    solved = links.search()
+    sudoku.nodes += links.nodes
+    if solved:
+        for row_id in links.solution:
+            x_pos, y_pos, box, bit = candidates[row_id]
+            sudoku.board[x_pos][y_pos] = sudoku.shape.bit_to_value[bit]
+            sudoku.row_used[x_pos] |= bit
+            sudoku.column_used[y_pos] |= bit
+            sudoku.box_used[box] |= bit
+        sudoku.unfilled.clear()
+    return solved
+
+
+ENGINES = {'mrv': solve, 'propagate': solve_propagating,
+           'dlx': solve_exact_cover}
+
+
+def row_from_line(line, file_empty_symbol):
+    raw_row = line.split()
+    return [EMPTY_SYMBOL if x == file_empty_symbol else x for x in raw_row]
 
 
 def board_from_file(file_in, file_empty_symbol):
     board = []
     for line in file_in.read().splitlines():
         if line:
-            raw_row = line.split(' ')[:-1]
-            row = [EMPTY_SYMBOL if x == file_empty_symbol else x for x in raw_row]
-            board.append(row)
+            board.append(row_from_line(line, file_empty_symbol))
     return board
 
 
-def solve_files(file_in, file_out, file_empty_symbol):
+def boards_from_file(file_in, file_empty_symbol):
+    """Yield the boards of a file holding one or more puzzles,
+    in the format of the test instances. The size of each board
+    is the number of symbols in its first line."""
+    board = []
+    for line in file_in:
+        if not line.strip():
+            continue
+        board.append(row_from_line(line, file_empty_symbol))
+        if len(board) == len(board[0]):
+            yield board
+            board = []
+
+
+def solve_files(file_in, file_out, file_empty_symbol, engine='mrv'):
     board_in = board_from_file(file_in, file_empty_symbol)
+    shape = Shape.for_size(len(board_in))
     print('Solving')
     for row in board_in:
-        print("".join(row))
+        print(shape.format_row(row))
     print('\n')
 
-    sudoku = Sudoku(board_in)
-    consistent = solve(sudoku)
+    sudoku = Sudoku(board_in, shape=shape)
+    consistent = ENGINES[engine](sudoku)
     if not consistent:
         file_out.write('No solution.')
     else:
         file_out.write('Solution: \n\n')
         for row in sudoku.board:
-            file_out.write("".join(row) + "\n")
+            file_out.write(shape.format_row(row) + "\n")
+
+
+@dataclasses.dataclass()
+class BatchResult:
+    source: str
+    index: int  # Position of the puzzle within its file.
+    solved: bool
+    board: list[list[str]] = dataclasses.field(repr=False)
+    nodes: int
+    seconds: float
+
+
+def puzzles_from_path(path, file_empty_symbol):
+    """Yield (file name, index in file, board) for every puzzle in path,
+    which is either a puzzle file or a directory of them."""
+    if os.path.isdir(path):
+        file_names = sorted(os.path.join(path, name)
+                            for name in os.listdir(path)
+                            if name.endswith('.txt'))
+    else:
+        file_names = [path]
+    for file_name in file_names:
+        with open(file_name) as file_in:
+            for index, board in enumerate(boards_from_file(file_in,
+                                                           file_empty_symbol)):
+                yield file_name, index, board
+
+
+def _solve_timed(task):
+    """Solve one puzzle in a worker process."""
+    source, index, board, engine = task
+    start = time.perf_counter()
+    sudoku = Sudoku(board)
+    solved = ENGINES[engine](sudoku)
+    return BatchResult(source, index, solved, sudoku.board,
+                       sudoku.nodes, time.perf_counter() - start)
+
+
+def solve_batch(path, file_empty_symbol, engine='mrv',
+                processes=None, chunksize=64):
+    """Solve all the puzzles in path on a pool of processes.
+
+    Puzzles are sent to the workers chunksize at a time, and the results
+    are yielded as they come, in the order of the input."""
+    tasks = ((source, index, board, engine) for source, index, board
+             in puzzles_from_path(path, file_empty_symbol))
+    with Pool(processes) as pool:
+        yield from pool.imap(_solve_timed, tasks, chunksize)
+
+
+def write_batch(results, file_out):
+    """Write one line per puzzle: where it came from, the solution
+    (or 'No solution.'), the number of search nodes and the solving time."""
+    for result in results:
+        shape = Shape.for_size(len(result.board))
+        solution = (shape.format_board(result.board)
+                    if result.solved else 'No solution.')
+        file_out.write(f'{result.source}:{result.index} {solution} '
+                       f'{result.nodes} {result.seconds:.6f}\n')
 
 
 # For LeetCode
 class Solution:
+    def __init__(self, engine='mrv'):
+        """Choose 'mrv' for backtracking, 'propagate' for backtracking
+        with constraint propagation, or 'dlx' for exact cover."""
+        self.engine = engine
+
     def solveSudoku(self, board: list[list[str]]) -> None:
         """The main solving method."""
         sudoku = Sudoku(board)
-        consistent = solve(sudoku)
+        consistent = ENGINES[self.engine](sudoku)
         if not consistent:
             pass  # Error out
         board = sudoku.board
 
 
 def main():
+    # With arguments, solve a file or directory of puzzles in batch:
+    # python sudoku-solver.py PATH [ENGINE]
+    if len(argv) > 1:
+        engine = argv[2] if len(argv) > 2 else 'mrv'
+        write_batch(solve_batch(argv[1], '0', engine), stdout)
+        return
     with open("test-instances/s09a.txt") as file_in:
         solve_files(file_in, stdout, '0')
 
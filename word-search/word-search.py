@@ -1,10 +1,15 @@
 import dataclasses
-from collections import defaultdict
-from itertools import product
-USED_SYMBOL = "."
+import mmap
+import struct
+import time
+from array import array
+from itertools import accumulate
+from multiprocessing import Pool, shared_memory
+from multiprocessing.util import Finalize
+NO_INDEX = -1
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Node:
     children: dict[str: 'Node'] = dataclasses.field(default_factory=dict)
     word:  str = dataclasses.field(default=None)
@@ -37,6 +42,152 @@ class Trie:
         return _delete(self.root, word_to_delete, 0)
 
 
+class ArrayTrie:
+    """A trie over a fixed alphabet, stored in flat arrays.
+
+    Nodes are numbers, the root is 0. The child of node for the letter
+    with index i in the alphabet is children[node * len(alphabet) + i],
+    with 0 meaning no child (the root is no one's child).
+    word_ids[node] is the index in words of the word ending at node, or -1,
+    child_counts[node] is the number of children of node,
+    so that delete can prune empty subtries,
+    and word_counts[node] is the number of words in the subtrie of node.
+
+    A trie can be saved to a file, and loaded back (read-only) via mmap,
+    without copying or parsing any of it.
+    """
+    # magic, stride, nodes, words, length of the encoded alphabet,
+    # total length of the encoded words
+    _HEADER = struct.Struct('<4s5q')
+    _MAGIC = b'TRI1'
+
+    def __init__(self, alphabet):
+        self.alphabet = alphabet
+        self.letter_index = {letter: i for i, letter in enumerate(alphabet)}
+        self.stride = len(alphabet)
+        self._no_children = array('i', [0] * self.stride)
+        self.children = array('i', self._no_children)
+        self.word_ids = array('i', [-1])
+        self.child_counts = array('i', [0])
+        self.word_counts = array('i', [0])
+        self.words = []
+
+    def insert(self, word):
+        children, word_ids = self.children, self.word_ids
+        node = 0
+        path = [node]
+        for char in word:
+            slot = node * self.stride + self.letter_index[char]
+            child = children[slot]
+            if not child:
+                child = children[slot] = len(word_ids)
+                self.child_counts[node] += 1
+                children.extend(self._no_children)
+                word_ids.append(-1)
+                self.child_counts.append(0)
+                self.word_counts.append(0)
+            node = child
+            path.append(node)
+        if word_ids[node] < 0:
+            for node in path:
+                self.word_counts[node] += 1
+        word_ids[path[-1]] = len(self.words)
+        self.words.append(word)
+
+    def delete(self, word):
+        """Clear word, prune the nodes that are left without words below them,
+        and return whether the whole trie is now empty."""
+        path = [0]
+        for char in word:
+            node = self.children[path[-1] * self.stride
+                                 + self.letter_index[char]]
+            if not node:
+                return False
+            path.append(node)
+        if self.word_ids[path[-1]] < 0:
+            return False
+        self.word_ids[path[-1]] = -1
+        for node in path:
+            self.word_counts[node] -= 1
+        for depth in range(len(word), 0, -1):
+            node = path[depth]
+            if self.word_ids[node] >= 0 or self.child_counts[node]:
+                return False
+            parent = path[depth - 1]
+            self.children[parent * self.stride
+                          + self.letter_index[word[depth - 1]]] = 0
+            self.child_counts[parent] -= 1
+        return self.word_ids[0] < 0 and not self.child_counts[0]
+
+    def tobytes(self):
+        """The trie as saved to a file."""
+        alphabet = self.alphabet.encode()
+        encoded = [word.encode() for word in self.words]
+        words = b"".join(encoded)
+        word_ends = array('i', accumulate(map(len, encoded)))
+        header = self._HEADER.pack(
+            self._MAGIC, self.stride, len(self.word_ids), len(self.words),
+            len(alphabet), len(words))
+        tables = [array('i', table).tobytes()
+                  for table in (self.children, self.word_ids,
+                                self.child_counts, self.word_counts,
+                                word_ends)]
+        return b"".join([header, *tables, alphabet, words])
+
+    def save(self, file_name):
+        with open(file_name, 'wb') as file_out:
+            file_out.write(self.tobytes())
+
+    @classmethod
+    def load(cls, file_name):
+        """Map a saved trie into memory. The trie can be searched,
+        but not changed."""
+        with open(file_name, 'rb') as file_in:
+            data = mmap.mmap(file_in.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls.from_buffer(data)
+
+    @classmethod
+    def from_buffer(cls, data):
+        """The trie saved in data (anything supporting the buffer protocol,
+        like an mmap or shared memory), used in place."""
+        magic, stride, nodes, word_count, alphabet_length, words_length = \
+            cls._HEADER.unpack_from(data)
+        if magic != cls._MAGIC:
+            raise ValueError('not a saved trie')
+        view = memoryview(data)
+        start = cls._HEADER.size
+        trie = cls.__new__(cls)
+        tables = []
+        for length in (stride * nodes, nodes, nodes, nodes, word_count):
+            end = start + 4 * length
+            tables.append(view[start:end].cast('i'))
+            start = end
+        (trie.children, trie.word_ids, trie.child_counts, trie.word_counts,
+         word_ends) = tables
+        trie.alphabet = bytes(view[start:start + alphabet_length]).decode()
+        trie.letter_index = {letter: i
+                             for i, letter in enumerate(trie.alphabet)}
+        trie.stride = stride
+        start += alphabet_length
+        trie.words = PackedWords(view[start:start + words_length], word_ends)
+        return trie
+
+
+class PackedWords:
+    """The words of a loaded ArrayTrie: word i is data[ends[i-1]:ends[i]],
+    decoded only when accessed."""
+    def __init__(self, data, ends):
+        self._data = data
+        self._ends = ends
+
+    def __len__(self):
+        return len(self._ends)
+
+    def __getitem__(self, i):
+        start = self._ends[i - 1] if i else 0
+        return bytes(self._data[start:self._ends[i]]).decode()
+
+
 def build_trie(words: list[str]):
     trie = Trie()
     for word in words:
@@ -44,49 +195,382 @@ def build_trie(words: list[str]):
     return trie
 
 
+def build_array_trie(words: list[str]):
+    trie = ArrayTrie("".join(sorted(set("".join(words)))))
+    for word in words:
+        trie.insert(word)
+    return trie
+
+
 def build_neighbours(width, depth):
-    neighbours = defaultdict(list)
-    for row, column in product(range(depth), range(width)):
-        for dr, dc in [(1, 0), (-1, 0), (0, 1), (0, -1)]:
-            if 0 <= row+dr < depth and 0 <= column+dc < width:
-                neighbours[row, column].append((row+dr, column+dc))
-    return neighbours
+    """The neighbours of the cells, numbered row * width + column,
+    as a flat list: those of cell are neighbours[starts[cell]:starts[cell+1]].
+    Return starts and neighbours."""
+    starts, neighbours = [0], []
+    for row in range(depth):
+        for column in range(width):
+            for dr, dc in [(1, 0), (-1, 0), (0, 1), (0, -1)]:
+                if 0 <= row+dr < depth and 0 <= column+dc < width:
+                    neighbours.append((row+dr) * width + column+dc)
+            starts.append(len(neighbours))
+    return starts, neighbours
 
 
-class Solution:
-    def findWords(self, board: list[list[str]], words: list[str]) -> list[str]:
+@dataclasses.dataclass
+class SearchProfile:
+    """What a search of WordSearcher.find_words did.
+
+    calls counts the cells added to a path (the calls of a recursive DFS),
+    misses the cells not added because their letter leads out of the trie,
+    or to a subtrie with no words left to find, finds the words found,
+    and prunes the trie nodes left with no words to find by a find.
+    cell_calls and cell_seconds are the calls and the time spent on
+    the paths from each starting cell, numbered row * width + column."""
+    width: int = 0
+    depth: int = 0
+    calls: int = 0
+    misses: int = 0
+    finds: int = 0
+    prunes: int = 0
+    seconds: float = 0.0
+    cell_calls: list[int] = dataclasses.field(default_factory=list, repr=False)
+    cell_seconds: list[float] = dataclasses.field(default_factory=list,
+                                                  repr=False)
+
+    def reset(self, width, depth):
+        self.width, self.depth = width, depth
+        self.calls = self.misses = self.finds = self.prunes = 0
+        self.seconds = 0.0
+        self.cell_calls = [0] * (width * depth)
+        self.cell_seconds = [0.0] * (width * depth)
+
+    def heat_map(self, values=None):
+        """values (by default cell_seconds) as a matrix of the board."""
+        if values is None:
+            values = self.cell_seconds
+        return [values[row * self.width:(row + 1) * self.width]
+                for row in range(self.depth)]
+
+    def report(self) -> str:
+        """The counts, and a heat map of the milliseconds spent
+        on the paths from each starting cell."""
+        lines = [f'{self.calls} calls, {self.misses} misses, '
+                 f'{self.finds} finds, {self.prunes} prunes '
+                 f'in {self.seconds * 1000:.3f}ms.']
+        for row in self.heat_map():
+            lines.append(' '.join(f'{seconds * 1000:8.3f}' for seconds in row))
+        return '\n'.join(lines)
 
-        trie = build_trie(words)
+
+class WordSearcher:
+    """Searches boards for the words of a trie that is built, or loaded,
+    only once.
+
+    A search never changes the trie. Instead, it prunes found words
+    in its own copy of the word counts of the trie (the number of words
+    not found yet in the subtrie of each node), which is much smaller
+    than the trie itself. Neighbour tables are cached for each board shape.
+
+    Before searching, the counts are recomputed, if it takes at most
+    FILTER_VISITS trie nodes per cell of the board, to include only the
+    words that the letters of the board suffice for: then the search
+    can stop as soon as it finds all the words it possibly can.
+    """
+    FILTER_VISITS = 4
+    def __init__(self, trie):
+        self.trie = trie
+        self._neighbours = {}
+
+    @classmethod
+    def from_words(cls, words: list[str]):
+        return cls(build_array_trie(words))
+
+    @classmethod
+    def load(cls, file_name):
+        return cls(ArrayTrie.load(file_name))
+
+    def save(self, file_name):
+        self.trie.save(file_name)
+
+    def neighbours(self, width, depth):
+        if (width, depth) not in self._neighbours:
+            self._neighbours[width, depth] = build_neighbours(width, depth)
+        return self._neighbours[width, depth]
+
+    def feasible_counts(self, letters):
+        """The number of words in the subtrie of each node that can be
+        spelled with letters (a list of indexes in the alphabet, with
+        repeats), as a dictionary over the nodes that can be reached,
+        or None if that takes visiting more than
+        FILTER_VISITS * len(letters) nodes."""
+        trie = self.trie
+        children, word_ids, stride = trie.children, trie.word_ids, trie.stride
+        budget = [0] * stride
+        for letter in letters:
+            if letter != NO_INDEX:
+                budget[letter] += 1
+        present = [letter for letter in range(stride) if budget[letter]]
+        counts = {}
+        visits_left = self.FILTER_VISITS * len(letters)
+        # A DFS over the trie, spending the budget on the way down.
+        # An entry (~node, letter, parent) means that node is finished.
+        stack = [(0, NO_INDEX, NO_INDEX)]
+        while stack:
+            node, letter, parent = stack.pop()
+            if node < 0:
+                node = ~node
+                if parent != NO_INDEX:
+                    budget[letter] += 1
+                    counts[parent] += counts[node]
+                continue
+            visits_left -= 1
+            if visits_left < 0:
+                return None
+            if parent != NO_INDEX:
+                budget[letter] -= 1
+            counts[node] = 1 if word_ids[node] >= 0 else 0
+            stack.append((~node, letter, parent))
+            for child_letter in present:
+                if budget[child_letter]:
+                    child = children[node * stride + child_letter]
+                    if child:
+                        stack.append((child, child_letter, node))
+        return counts
+
+    def _search_state(self, board):
+        """The letters of the cells of board, numbered row * width + column,
+        as indexes in the alphabet of the trie, the cells that can not be
+        used, and the word counts to start the search with."""
+        trie = self.trie
+        letters = [trie.letter_index.get(letter, NO_INDEX)
+                   for row in board for letter in row]
+        # Cells on the current path, and those with letters of no word.
+        used = bytearray(letter == NO_INDEX for letter in letters)
+
+        counts = self.feasible_counts(letters)
+        if counts is None:
+            remaining = array('i', trie.word_counts.tobytes())
+        else:
+            # Nodes the board can not reach are never looked at.
+            remaining = array('i', bytes(4 * len(trie.word_ids)))
+            for node, count in counts.items():
+                remaining[node] = count
+        return letters, used, remaining
+
+    def find_words(self, board: list[list[str]],
+                   start_cells=None, profile=None) -> list[str]:
+        """The words on board, as paths starting from the cells
+        in start_cells (numbered row * width + column), by default all.
+
+        If profile is a SearchProfile, the search is done by an
+        instrumented copy of the loop below, which fills it in.
+        Without it, the loop below has no instrumentation at all."""
+        if profile is not None:
+            return self._find_words_profiled(board, start_cells, profile)
+        trie = self.trie
+        children, word_ids, stride = trie.children, trie.word_ids, trie.stride
         width, depth = len(board[0]), len(board)
-        neighbours = build_neighbours(width, depth)
+        starts, neighbours = self.neighbours(width, depth)
+        letters, used, remaining = self._search_state(board)
         results = []
+        found = set()
 
-        def dfs(row, column, node):
-            if board[row][column] not in node.children:
-                return
+        def visit(node):
+            found.add(node)
+            results.append(trie.words[word_ids[node]])
+
+        # An iterative DFS. The current cell, its trie node, and
+        # the range of its neighbours left to try are in local variables;
+        # those of the cells before it on the path are on the stack.
+        if start_cells is None:
+            start_cells = range(width * depth)
+        for start in start_cells:
+            if not remaining[0]:
+                break
+            if used[start]:
+                continue
+            node = children[letters[start]]
+            if not node or not remaining[node]:
+                continue
+            if word_ids[node] >= 0 and node not in found:
+                visit(node)
+                remaining[0] -= 1
+                remaining[node] -= 1
+            used[start] = 1
+            stack = []
+            cell, position, end = start, starts[start], starts[start + 1]
+            while True:
+                if position < end and remaining[node]:
+                    new_cell = neighbours[position]
+                    position += 1
+                    if used[new_cell]:
+                        continue
+                    child = children[node * stride + letters[new_cell]]
+                    if child and remaining[child]:
+                        if word_ids[child] >= 0 and child not in found:
+                            visit(child)
+                            # Remove the word from the counts along the path.
+                            remaining[0] -= 1
+                            for frame in stack:
+                                remaining[frame[1]] -= 1
+                            remaining[node] -= 1
+                            remaining[child] -= 1
+                        stack.append((cell, node, position, end))
+                        cell, node = new_cell, child
+                        position, end = starts[cell], starts[cell + 1]
+                        used[cell] = 1
+                else:
+                    used[cell] = 0
+                    if not stack:
+                        break
+                    cell, node, position, end = stack.pop()
+
+        return results
 
-            letter = board[row][column]
-            board[row][column] = USED_SYMBOL
-            new_node = node.children[letter]
+    def _find_words_profiled(self, board, start_cells, profile):
+        """find_words, counting what the search does in profile.
 
-            if new_node.word is not None:
-                results.append(new_node.word)
-                trie.delete(new_node.word)
-                # or delete "in place":
-                # if not new_node.children:
-                #     node.children.pop(letter)
+        Keep this loop in step with the one of find_words."""
+        trie = self.trie
+        children, word_ids, stride = trie.children, trie.word_ids, trie.stride
+        width, depth = len(board[0]), len(board)
+        starts, neighbours = self.neighbours(width, depth)
+        profile.reset(width, depth)
+        total_start = time.perf_counter()
+        letters, used, remaining = self._search_state(board)
+        results = []
+        found = set()
+        calls = misses = finds = prunes = 0
 
-            for new_row, new_column in neighbours[row, column]:
-                dfs(new_row, new_column, new_node)
+        def visit(node):
+            found.add(node)
+            results.append(trie.words[word_ids[node]])
 
-            # clean-up
-            board[row][column] = letter
+        def remove(node):
+            """Decrease the count of node, and return 1 if it drops to 0."""
+            remaining[node] -= 1
+            return not remaining[node]
 
-        for row_start, column_start in product(range(depth), range(width)):
-            dfs(row_start, column_start, trie.root)
+        if start_cells is None:
+            start_cells = range(width * depth)
+        for start in start_cells:
+            if not remaining[0]:
+                break
+            if used[start]:
+                continue
+            cell_start, cell_calls = time.perf_counter(), calls
+            node = children[letters[start]]
+            if not node or not remaining[node]:
+                misses += 1
+                profile.cell_seconds[start] += time.perf_counter() - cell_start
+                continue
+            calls += 1
+            if word_ids[node] >= 0 and node not in found:
+                visit(node)
+                finds += 1
+                prunes += remove(0) + remove(node)
+            used[start] = 1
+            stack = []
+            cell, position, end = start, starts[start], starts[start + 1]
+            while True:
+                if position < end and remaining[node]:
+                    new_cell = neighbours[position]
+                    position += 1
+                    if used[new_cell]:
+                        continue
+                    child = children[node * stride + letters[new_cell]]
+                    if child and remaining[child]:
+                        calls += 1
+                        if word_ids[child] >= 0 and child not in found:
+                            visit(child)
+                            finds += 1
+                            prunes += remove(0)
+                            for frame in stack:
+                                prunes += remove(frame[1])
+                            prunes += remove(node) + remove(child)
+                        stack.append((cell, node, position, end))
+                        cell, node = new_cell, child
+                        position, end = starts[cell], starts[cell + 1]
+                        used[cell] = 1
+                    else:
+                        misses += 1
+                else:
+                    used[cell] = 0
+                    if not stack:
+                        break
+                    cell, node, position, end = stack.pop()
+            profile.cell_calls[start] += calls - cell_calls
+            profile.cell_seconds[start] += time.perf_counter() - cell_start
 
+        profile.calls, profile.misses = calls, misses
+        profile.finds, profile.prunes = finds, prunes
+        profile.seconds = time.perf_counter() - total_start
         return results
 
+    def find_words_parallel(self, boards: list[list[list[str]]],
+                            processes=None, shards_per_board=1):
+        """The words found on each of the boards, searched in a pool
+        of processes that share the trie, read-only, in shared memory.
+
+        Each board is split into shards_per_board shards of starting cells,
+        so that a few huge boards can use all processes too.
+        The words found on the shards of a board are merged without
+        repeats."""
+        data = self.trie.tobytes()
+        memory = shared_memory.SharedMemory(create=True, size=len(data))
+        try:
+            memory.buf[:len(data)] = data
+            del data
+            tasks = []
+            for board_number, board in enumerate(boards):
+                cells = len(board) * len(board[0])
+                shards = min(shards_per_board, cells)
+                for shard in range(shards):
+                    tasks.append((board_number, board,
+                                  range(shard * cells // shards,
+                                        (shard + 1) * cells // shards)))
+            results = [{} for _ in boards]
+            with Pool(processes, initializer=_attach_searcher,
+                      initargs=(memory.name,)) as pool:
+                for board_number, found in pool.imap_unordered(_search_shard,
+                                                               tasks):
+                    results[board_number].update(dict.fromkeys(found))
+            return [list(found) for found in results]
+        finally:
+            memory.close()
+            memory.unlink()
+
+
+# The shared memory and the searcher of a worker of find_words_parallel.
+_worker_memory = None
+_worker_searcher = None
+
+
+def _attach_searcher(name):
+    global _worker_memory, _worker_searcher
+    _worker_memory = shared_memory.SharedMemory(name=name)
+    _worker_searcher = WordSearcher(ArrayTrie.from_buffer(_worker_memory.buf))
+    # The trie has to let go of the memory before it can be closed.
+    Finalize(None, _detach_searcher, exitpriority=10)
+
+
+def _detach_searcher():
+    global _worker_searcher
+    _worker_searcher = None
+    _worker_memory.close()
+
+
+def _search_shard(task):
+    board_number, board, start_cells = task
+    return board_number, _worker_searcher.find_words(board, start_cells)
+
+
+class Solution:
+    def findWords(self, board: list[list[str]], words: list[str],
+                  profile=None) -> list[str]:
+        return WordSearcher.from_words(words).find_words(board,
+                                                         profile=profile)
+
 
 if __name__ == "__main__":
     solution = Solution()